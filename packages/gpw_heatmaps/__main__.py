@@ -1,6 +1,77 @@
+import argparse
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pytz
 from bot import WIGBot
+from planner import is_session_open
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Post heatmaps of GPW indices")
+
+    parser.add_argument(
+        "--universe",
+        "-u",
+        action="append",
+        help="index to post heatmaps of, defined in data/universes.json; can be repeated, defaults to WIG",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        default=False,
+        help="refresh 1D heatmaps during the session instead of posting end of day ones",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=WIGBot.LIVE_INTERVAL.total_seconds() / 60,
+        help="minutes between live refreshes",
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        metavar=("START", "END"),
+        type=pd.Timestamp,
+        help="render heatmaps of sessions from START to END (YYYY-MM-DD) without posting",
+    )
+    parser.add_argument(
+        "--period",
+        action="append",
+        choices=WIGBot.PERIODS,
+        help="period to backfill; can be repeated, defaults to all",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("backfill"),
+        help="directory for backfilled heatmaps",
+    )
+
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    bot = WIGBot()
+    args = parse_args()
+    universes = args.universe or ("WIG",)
 
-    bot.run()
+    if args.backfill:
+        start, end = args.backfill
+        periods = args.period or WIGBot.PERIODS
+        # request more than one year before start, like the daily run does
+        bot = WIGBot(
+            universes=universes,
+            plan=list(periods),
+            history_start=start - timedelta(days=400),
+            auto_auth=False,
+        )
+        bot.backfill(start, end, periods, out_dir=args.output)
+    elif args.live:
+        # live heatmaps are not posted, so there is no need to authenticate
+        is_open = is_session_open(datetime.now(pytz.timezone("Europe/Warsaw")))
+        bot = WIGBot(universes=universes, plan=["1D"] if is_open else [], auto_auth=False)
+        bot.run_live(interval=timedelta(minutes=args.interval))
+    else:
+        bot = WIGBot(universes=universes)
+        bot.run()
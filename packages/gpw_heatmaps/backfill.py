@@ -0,0 +1,85 @@
+"""Returns of many periods ending at many past sessions.
+
+Periods follow the same rules as the daily run, but start and end rows are
+found for all sessions of a date range at once, so an archive of heatmaps
+can be rebuilt from a single price panel.
+"""
+
+from collections.abc import Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def _group_starts(*keys: np.ndarray) -> np.ndarray:
+    """Find the first row of the group of every row, for rows sorted by keys."""
+    rows = np.arange(len(keys[0]))
+    same_group = np.zeros(len(rows), dtype=bool)
+    same_group[1:] = True
+    for key in keys:
+        same_group[1:] &= key[1:] == key[:-1]
+    return np.maximum.accumulate(np.where(same_group, 0, rows))
+
+
+def period_bounds(dates: pd.DatetimeIndex, end_rows: np.ndarray, periods: Sequence[str]) -> np.ndarray:
+    """Find start and end rows of periods ending at many sessions at once.
+
+    Args:
+        dates (pd.DatetimeIndex): sorted sessions of the price panel
+        end_rows (np.ndarray): rows of the last sessions of periods
+        periods (Sequence[str]): periods, any of 1D, 1W, MTD, QTD, YTD, 1Y
+
+    Raises:
+        NotImplementedError: If a period is not available.
+
+    Returns:
+        np.ndarray: end rows x periods x (start row, end row), -1 where there is not enough data
+
+    """
+    end_rows = np.asarray(end_rows, dtype=np.intp)
+    year = dates.year.to_numpy()
+    week = dates.isocalendar().week.to_numpy()
+
+    # periods start from the last session before them
+    year_starts = _group_starts(year)[end_rows]
+    starts = {
+        "1D": end_rows - 1,
+        "1W": np.maximum(_group_starts(year, week)[end_rows] - 1, 0),
+        "MTD": np.maximum(_group_starts(year, dates.month.to_numpy())[end_rows] - 1, 0),
+        "QTD": np.maximum(_group_starts(year, dates.quarter.to_numpy())[end_rows] - 1, 0),
+        "YTD": np.where(
+            (year_starts > 0) & (year[year_starts - 1] == year[end_rows] - 1),
+            year_starts - 1,
+            -1,
+        ),
+        "1Y": np.maximum(end_rows - 252, 0),
+    }
+
+    unknown = [period for period in periods if period not in starts]
+    if unknown:
+        msg = f"periods {unknown} not available"
+        raise NotImplementedError(msg)
+
+    bounds = np.empty((len(end_rows), len(periods), 2), dtype=np.intp)
+    for i, period in enumerate(periods):
+        has_data = (starts[period] >= 0) & (end_rows > 0)
+        bounds[:, i, 0] = np.where(has_data, starts[period], -1)
+        bounds[:, i, 1] = np.where(has_data, end_rows, -1)
+    return bounds
+
+
+def period_returns(values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """Calculate returns of all tickers for all bounds in one pass.
+
+    Args:
+        values (np.ndarray): dates x tickers prices
+        bounds (np.ndarray): end rows x periods x (start row, end row), -1 where there is not enough data
+
+    Returns:
+        np.ndarray: end rows x periods x tickers returns, NaN where there is not enough data
+
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = values[bounds[..., 1]] / values[bounds[..., 0]] - 1
+    returns[bounds[..., 0] < 0] = np.nan
+    return returns
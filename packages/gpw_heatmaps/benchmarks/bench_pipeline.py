@@ -0,0 +1,274 @@
+"""Benchmarks of WIGBot pipeline on synthetic data.
+
+Generates price panels and component tables from the size of WIG up to
+thousands of tickers, times every stage of the pipeline separately and
+records its peak memory. Peak memory does not depend on the machine and is
+compared against the committed baseline. Times do, so they are compared only
+against a baseline given with --time-baseline, recorded on the same machine.
+
+Usage:
+    uv run packages/gpw_heatmaps/benchmarks/bench_pipeline.py
+    uv run packages/gpw_heatmaps/benchmarks/bench_pipeline.py --update-baseline
+    uv run packages/gpw_heatmaps/benchmarks/bench_pipeline.py --time-baseline benchmarks/times.local.json
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# importing bot changes the working directory, paths from the command line are relative to this one
+INVOCATION_DIR = Path.cwd()
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from bot import WIGBot  # noqa: E402
+from heatmap import make_heatmap_figure  # noqa: E402
+from mylogging import setup  # noqa: E402
+
+logger = setup(__name__, __file__)
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+# growth always allowed, so stages taking next to nothing do not fail on noise
+SLACKS = {"seconds": 0.005, "peak_mb": 1.0}
+UNITS = {"seconds": "s", "peak_mb": "MB"}
+
+# (number of tickers, years of history)
+SCENARIOS = ((325, 2), (1000, 5), (3000, 10))
+SECTORS = (
+    "Financial Services",
+    "Energy",
+    "Basic Materials",
+    "Consumer Cyclical",
+    "Technology",
+    "Communication Services",
+    "Industrials",
+    "Utilities",
+    "Healthcare",
+    "Real Estate",
+    "Consumer Defensive",
+)
+
+
+def make_components(n_tickers: int, rng: np.random.Generator) -> pd.DataFrame:
+    tickers = [f"T{i:05d}" for i in range(n_tickers)]
+    sectors = rng.choice(SECTORS, size=n_tickers)
+    return pd.DataFrame({
+        "company": [f"COMPANY{i}" for i in range(n_tickers)],
+        "ISIN": [f"PL{i:010d}" for i in range(n_tickers)],
+        "yf_ticker": [f"{ticker}.WA" for ticker in tickers],
+        "sector": sectors,
+        "industry": [f"{sector} {i % 5}" for i, sector in enumerate(sectors)],
+        "shares_num": rng.integers(1_000_000, 1_000_000_000, size=n_tickers),
+        "ticker": tickers,
+    })
+
+
+def make_history(components: pd.DataFrame, years: int, today: pd.Timestamp, rng: np.random.Generator) -> pd.DataFrame:
+    """Random walk closes in long format, like the ones from the price store.
+
+    Returns:
+        pd.DataFrame: cols('date', 'symbol', 'close')
+
+    """
+    dates = pd.bdate_range(end=today, periods=252 * years)
+    log_returns = rng.normal(0, 0.02, size=(len(dates), len(components)))
+    closes = 50 * np.exp(np.cumsum(log_returns, axis=0))
+
+    # some tickers are listed later and have no data at the beginning
+    listed_from = rng.integers(0, len(dates) // 2, size=len(components)) * (rng.random(len(components)) < 0.1)
+    closes[np.arange(len(dates))[:, None] < listed_from] = np.nan
+
+    history = pd.DataFrame({
+        "date": np.repeat(dates, len(components)),
+        "symbol": np.tile(components.yf_ticker.to_numpy(), len(dates)),
+        "close": closes.ravel(),
+    })
+    return history.dropna().reset_index(drop=True)
+
+
+def measure(fn: Callable[[], Any], repeat: int = 3) -> tuple[Any, float, float]:
+    """Run fn once under tracemalloc for its peak memory, then repeat times for its time.
+
+    Tracing slows allocations down, so time is taken from untraced runs,
+    the fastest one, which is the least disturbed by the rest of the machine.
+
+    Returns:
+        tuple[Any, float, float]: result, seconds, peak memory in MB
+
+    """
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times), peak / 1024**2
+
+
+def run_scenario(n_tickers: int, years: int, *, render: bool) -> dict[str, dict[str, float]]:
+    rng = np.random.default_rng(n_tickers * years)
+    today = pd.Timestamp("2024-12-31")
+    now = datetime(2024, 12, 31, 18, 0)
+
+    components = make_components(n_tickers, rng)
+    history = make_history(components, years, today, rng)
+
+    results = {}
+
+    prices, seconds, peak = measure(lambda: WIGBot._closes_to_prices(history))  # noqa: SLF001
+    results["closes_to_prices"] = {"seconds": seconds, "peak_mb": peak}
+
+    bot, seconds, peak = measure(lambda: WIGBot.from_data(components, prices, today))
+    results["set_prices"] = {"seconds": seconds, "peak_mb": peak}
+
+    _, seconds, peak = measure(lambda: [bot.get_periods_indicies(period) for period in bot.period_index])
+    results["get_periods_indicies"] = {"seconds": seconds, "peak_mb": peak}
+
+    _, seconds, peak = measure(bot.get_returns_matrix)
+    results["get_returns_matrix"] = {"seconds": seconds, "peak_mb": peak}
+
+    data, seconds, peak = measure(lambda: bot._prepare_data_for_heatmap_and_tweet("YTD"))  # noqa: SLF001
+    results["prepare_data"] = {"seconds": seconds, "peak_mb": peak}
+
+    _, seconds, peak = measure(lambda: bot._prepare_tweet_text(data.copy(), "YTD"))  # noqa: SLF001
+    results["prepare_tweet_text"] = {"seconds": seconds, "peak_mb": peak}
+
+    fig, seconds, peak = measure(lambda: make_heatmap_figure(data, "YTD", now))
+    results["make_heatmap_figure"] = {"seconds": seconds, "peak_mb": peak}
+
+    if render:
+        path = Path(__file__).parent / f"bench_{n_tickers}_{years}.png"
+        _, seconds, peak = measure(lambda: bot.renderer.write(fig, str(path)), repeat=1)
+        results["render"] = {"seconds": seconds, "peak_mb": peak}
+        path.unlink(missing_ok=True)
+
+    return results
+
+
+def compare(results: dict, baseline: dict, metric: str, threshold: float) -> list[str]:
+    """Find stages where a metric grew against baseline by more than threshold.
+
+    Args:
+        results (dict): results of scenarios
+        baseline (dict): baseline of scenarios
+        metric (str): 'seconds' or 'peak_mb'
+        threshold (float): allowed relative growth
+
+    Returns:
+        list[str]: descriptions of regressions
+
+    """
+    regressions = []
+    for scenario, stages in results.items():
+        for stage, values in stages.items():
+            base = baseline.get(scenario, {}).get(stage, {}).get(metric)
+            if base is None:
+                continue
+            if values[metric] > base * (1 + threshold) + SLACKS[metric]:
+                unit = UNITS[metric]
+                regressions.append(f"{scenario} {stage}: {values[metric]:.4f}{unit} vs baseline {base:.4f}{unit}")
+    return regressions
+
+
+def load_baseline(path: Path) -> dict | None:
+    """Load baseline, None if it was not saved yet."""
+    if not path.exists():
+        logger.warning("no benchmark baseline, run with --update-baseline to create one", extra={"path": str(path)})
+        return None
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: dict, metric: str) -> None:
+    """Save one metric of results as baseline, keeping the baseline of scenarios that were not run."""
+    baseline = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            baseline = json.load(f)
+    for scenario, stages in results.items():
+        baseline[scenario] = {stage: {metric: values[metric]} for stage, values in stages.items()}
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=4)
+    logger.info("saved benchmark baseline", extra={"path": str(path), "metric": metric})
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark WIGBot pipeline on synthetic data")
+
+    parser.add_argument(
+        "--time-baseline",
+        type=Path,
+        help="baseline of times recorded on this machine, times are not compared without it",
+    )
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against time baseline")
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="allowed growth of peak memory against baseline",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="save peak memory as new baseline, and times too if --time-baseline is given",
+    )
+    parser.add_argument("--render", action="store_true", help="also render heatmaps with kaleido")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="TICKERSxYEARS to run, e.g. 325x2; can be repeated, defaults to all",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.time_baseline is not None:
+        args.time_baseline = INVOCATION_DIR / args.time_baseline
+
+    scenarios = SCENARIOS
+    if args.scenario:
+        scenarios = tuple(tuple(int(part) for part in scenario.split("x")) for scenario in args.scenario)
+
+    results = {}
+    for n_tickers, years in scenarios:
+        scenario = f"{n_tickers}x{years}"
+        results[scenario] = run_scenario(n_tickers, years, render=args.render)
+        for stage, values in results[scenario].items():
+            print(f"{scenario:>10} {stage:<24} {values['seconds']:>10.4f}s {values['peak_mb']:>10.1f}MB")  # noqa: T201
+
+    if args.update_baseline:
+        save_baseline(BASELINE_PATH, results, "peak_mb")
+        if args.time_baseline is not None:
+            save_baseline(args.time_baseline, results, "seconds")
+        return 0
+
+    regressions = []
+    baseline = load_baseline(BASELINE_PATH)
+    if baseline is not None:
+        regressions += compare(results, baseline, "peak_mb", args.memory_threshold)
+    if args.time_baseline is not None:
+        time_baseline = load_baseline(args.time_baseline)
+        if time_baseline is not None:
+            regressions += compare(results, time_baseline, "seconds", args.threshold)
+    for regression in regressions:
+        logger.error("benchmark regression", extra={"regression": regression})
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,20 +5,32 @@ Script includes TwitterBot class that will run bot that posts pictures with WIG
 
 import json
 import os
+import re
 import sys
+import time
+from collections.abc import Iterable
 from datetime import datetime, timedelta
-from http.client import IncompleteRead
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import pytz
 import yahooquery as yq
+from backfill import period_bounds, period_returns
+from components import ComponentRegistry
 from dotenv import load_dotenv
+from enrichment import SymbolResolver, fetch_asset_profiles, search_symbol
+from heatmap import chart_heatmap
 from mylogging import setup
 from pandas import Index
-from twitter_bot_base import TwitterBot
+from planner import SESSION_CLOSE, is_session_open, last_session, plan_posts
+from price_panel import PricePanel
+from price_store import PriceStore
+from render_cache import RenderCache
+from render_pool import RenderJob, render_heatmaps
+from renderer import HeatmapRenderer
+from twitter_bot_base import Replay, TwitterBot
+from universes import Universe, load_universes, universe_returns
 
 os.chdir(Path(__file__).parent)
 
@@ -33,36 +45,153 @@ class WIGBot(TwitterBot):
     Attributes:
         client (Client): tweepy client
         api (API): tweepy api
+        component_registry (ComponentRegistry): cached WIG portfolio from gpwbenchmark
+        symbol_resolver (SymbolResolver): memoized ISIN -> yahoo ticker lookups
         wig_components (pd.DataFrame): components of WIG index
         tickers (list): tickers of WIG components
         prices (pd.DataFrame): prices of WIG components
         wig (pd.Series): prices of WIG index
         curr_prices (pd.Series): current prices of WIG components
+        price_store (PriceStore): local store of downloaded closes
+        renderer (HeatmapRenderer): warm kaleido session, started on first render
+        render_cache (RenderCache): rendered heatmaps by content hash
         ts (pd.DataFrame): time series of date data
         tzinfo (pytz.timezone): timezone
         today (pd.Timestamp): today's date
+        plan (list[str]): periods to post today, in order of posting
+        period_index (dict[str, tuple[int, int]]): start and end row of prices for every period
+        returns (pd.DataFrame): returns of WIG components for every period
+        universes (dict[str, Universe]): index universes defined over WIG components
+        post_universes (list[str]): universes to post heatmaps of
+        universe_masks (pd.DataFrame): membership with index of tickers and columns of universes
+        universe_returns (pd.DataFrame): returns with index of universes and columns of periods
+        panel (PricePanel): prices updated in place by live mode
 
     """
 
-    def __init__(self, *args, **kwargs) -> None:
+    PERIODS = ("1D", "1W", "MTD", "QTD", "YTD", "1Y")
+    # 0 renders all heatmaps in this process through self.renderer
+    RENDER_WORKERS = 3
+    RENDER_TIMEOUT = 300
+    COMPONENTS_TTL = timedelta(days=7)
+    LIVE_INTERVAL = timedelta(minutes=15)
+    # seconds a live refresh may take, from quotes download to saved heatmaps
+    LIVE_BUDGET = 60.0
+
+    def __init__(
+        self,
+        *args,
+        universes: Iterable[str] = ("WIG",),
+        plan: list[str] | None = None,
+        history_start: pd.Timestamp | None = None,
+        **kwargs,
+    ) -> None:
         """Init method.
 
-        Autheticates with tweepy, downloads WIG components, prices and WIG index.
-        """
-        super().__init__(*args, **kwargs)
+        Plans posts for today. If anything is due, autheticates with tweepy,
+        downloads WIG components, prices and WIG index.
+
+        Args:
+            *args: passed to TwitterBot
+            universes (Iterable[str], optional): universes to post heatmaps of. Defaults to ("WIG",).
+            plan (list[str] | None, optional): periods to post. Defaults to None (planned from calendar).
+            history_start (pd.Timestamp | None, optional): first date of prices to load.
+                Defaults to None (400 days before today).
+            **kwargs: passed to TwitterBot
 
+        """
         self.tzinfo = pytz.timezone("Europe/Warsaw")
         self.today = pd.Timestamp(datetime.now(tz=self.tzinfo).today())
+        self._set_universes(universes)
+
+        self.plan = plan_posts(self.today.date()) if plan is None else plan
+        if not self.plan:
+            logger.info("nothing to post today, skipping auth and downloads")
+            return
 
+        super().__init__(*args, **kwargs)
+
+        self.component_registry = ComponentRegistry(ttl=self.COMPONENTS_TTL)
+        self.symbol_resolver = SymbolResolver()
         wig_components = self._get_wig_components()
         self.wig_components: pd.DataFrame = wig_components
         self.tickers: list = wig_components.yf_ticker.to_list()
         logger.info("downloaded wig components")
 
-        self.prices = self._get_data()
-        self.curr_prices = self.prices.iloc[-1]
+        self.price_store = PriceStore()
+        self.renderer = HeatmapRenderer()
+        self.render_cache = RenderCache()
+
+        self._set_prices(self._get_data(history_start))
         logger.info("downloaded data")
 
+        logger.info("init complete")
+
+    @classmethod
+    def from_data(
+        cls,
+        wig_components: pd.DataFrame,
+        prices: pd.DataFrame,
+        today: pd.Timestamp,
+        universes: Iterable[str] = ("WIG",),
+    ) -> "WIGBot":
+        """Create bot from already available data, without auth and downloads.
+
+        Args:
+            wig_components (pd.DataFrame): components like the ones from _get_wig_components
+            prices (pd.DataFrame): prices like the ones from _get_data
+            today (pd.Timestamp): date to calculate periods for
+            universes (Iterable[str], optional): universes to post heatmaps of. Defaults to ("WIG",).
+
+        Returns:
+            WIGBot: bot ready to prepare heatmaps
+
+        """
+        bot = cls.__new__(cls)
+        TwitterBot.__init__(bot, auto_auth=False)
+
+        bot.tzinfo = pytz.timezone("Europe/Warsaw")
+        bot.today = today
+        bot._set_universes(universes)
+        bot.plan = plan_posts(today.date())
+
+        bot.wig_components = wig_components
+        bot.tickers = wig_components.yf_ticker.to_list()
+
+        bot.renderer = HeatmapRenderer()
+        bot.render_cache = RenderCache()
+
+        bot._set_prices(prices)
+        return bot
+
+    def _set_universes(self, universes: Iterable[str]) -> None:
+        """Load universes definitions and choose the ones to post.
+
+        Args:
+            universes (Iterable[str]): names of universes to post heatmaps of
+
+        Raises:
+            ValueError: If any universe is not defined.
+
+        """
+        self.universes: dict[str, Universe] = load_universes()
+        self.post_universes = list(universes)
+
+        unknown = [name for name in self.post_universes if name not in self.universes]
+        if unknown:
+            msg = f"universes {unknown} not defined, available: {list(self.universes)}"
+            raise ValueError(msg)
+
+    def _set_prices(self, prices: pd.DataFrame) -> None:
+        """Set prices and everything calculated from them.
+
+        Args:
+            prices (pd.DataFrame): prices with index of dates and columns of stock prices
+
+        """
+        self.prices = prices
+        self.curr_prices = self.prices.iloc[-1]
+
         ts = pd.DataFrame(self.prices.index)
         ts["year"] = ts.date.dt.year
         ts["quarter"] = ts.date.dt.quarter
@@ -72,19 +201,14 @@ class WIGBot(TwitterBot):
         ts["weekday"] = ts.date.dt.weekday
         self.ts: pd.DataFrame = ts
 
-        logger.info("init complete")
-
-    def _get_data(self) -> pd.DataFrame:
-        """Get data from YahooFinance.
+        self.period_index = self._build_period_index()
+        self.returns = self.get_returns_matrix()
+        self.universe_masks, self.universe_returns = self.get_universe_returns()
 
-        Get pd.DataFrame of prices of selected tickers and transform it.
-
-        Returns:
-            pd.DataFrame: prices with index of dates and columns of stock prices
-
-        """
+    @staticmethod
+    def _download_history(symbols: list[str], start_date: pd.Timestamp) -> pd.DataFrame | dict | None:
         tickers = yq.Ticker(
-            self.tickers,
+            symbols,
             asynchronous=True,
             max_workers=4,
             progress=False,
@@ -98,42 +222,117 @@ class WIGBot(TwitterBot):
                 extra={"invalid_symbols": tickers.invalid_symbols},
             )
 
-        # request more than one year
-        # to ensure there will be at least one datapoint from the previous year
-        start_date = datetime.now(tz=self.tzinfo).today() - timedelta(days=400)
+        return tickers.history(start=start_date, interval="1d")
 
-        history = tickers.history(start=start_date, interval="1d")
+    def _download_closes(self, symbols: list[str], start_date: pd.Timestamp) -> pd.DataFrame | None:
+        """Download daily closes from YahooFinance.
 
-        if history is None:
-            logger.error("Failed to download price history.")
-            sys.exit(1)
+        Args:
+            symbols (list[str]): yahoo tickers
+            start_date (pd.Timestamp): first date to download
+
+        Returns:
+            pd.DataFrame | None: cols('date', 'symbol', 'close'), None if download failed
+
+        """
+        history = self.replay.call(
+            Replay.make_key("yahoo_history", sorted(symbols)),
+            self._download_history,
+            symbols,
+            start_date,
+        )
+
+        if not isinstance(history, pd.DataFrame):
+            return None
 
         # index with dates can have dates or datetimes, which will mess up
         # comparisons in pivot table
+        dates = pd.to_datetime(history.index.get_level_values("date"), utc=True).normalize().tz_localize(None)
 
-        new_dt_index = pd.to_datetime(history.index.get_level_values("date"), utc=True).date
+        return pd.DataFrame({
+            "date": dates,
+            "symbol": history.index.get_level_values("symbol"),
+            "close": history["close"].to_numpy(),
+        })
 
-        history.index = pd.MultiIndex.from_arrays(
-            [history.index.get_level_values("symbol"), new_dt_index],
-            names=["symbol", "date"],
-        )
+    def _get_data(self, lookback_start: pd.Timestamp | None = None) -> pd.DataFrame:
+        """Get data from YahooFinance.
 
-        prices = history.pivot_table(
-            index="date",
-            columns="symbol",
-            values="close",
+        Updates local price store with sessions missing since the last run
+        and transforms stored closes of selected tickers.
+
+        Args:
+            lookback_start (pd.Timestamp | None, optional): first date of prices.
+                Defaults to None (400 days before today).
+
+        Returns:
+            pd.DataFrame: prices with index of dates and columns of stock prices
+
+        """
+        if lookback_start is None:
+            # request more than one year
+            # to ensure there will be at least one datapoint from the previous year
+            lookback_start = pd.Timestamp(datetime.now(tz=self.tzinfo).date()) - timedelta(days=400)
+
+        # tickers without stored history need the whole lookback window,
+        # all of them do if the store starts after the window
+        first_date = self.price_store.first_date()
+        covers_lookback = first_date is not None and first_date <= lookback_start + timedelta(
+            days=self.price_store.overlap,
         )
+        stored_symbols = self.price_store.symbols() if covers_lookback else set()
+        known_tickers = [tick for tick in self.tickers if tick in stored_symbols]
+        new_tickers = [tick for tick in self.tickers if tick not in stored_symbols]
 
-        prices.index = pd.to_datetime(prices.index)
+        for symbols, start_date in (
+            (known_tickers, self.price_store.fetch_start(lookback_start)),
+            (new_tickers, lookback_start),
+        ):
+            if not symbols:
+                continue
 
-        prices.columns = [tick.removesuffix(".WA") for tick in prices.columns]
-        prices = prices.ffill()
+            logger.info(
+                "downloading price history",
+                extra={"number_of_tickers": len(symbols), "start_date": start_date},
+            )
+            closes = self._download_closes(symbols, start_date)
+            if closes is None:
+                if symbols is new_tickers:
+                    logger.error("Failed to download price history.")
+                    sys.exit(1)
+
+                # stored prices are good enough only if they already have the last session
+                stored_last_date = self.price_store.last_date()
+                expected_date = pd.Timestamp(last_session(self.today.date()))
+                if stored_last_date is None or stored_last_date < expected_date:
+                    logger.error(
+                        "Failed to update price history, stored prices are stale.",
+                        extra={"last_stored_date": stored_last_date, "expected_date": expected_date},
+                    )
+                    sys.exit(1)
+                logger.warning("failed to update price history, using stored prices")
+                continue
+
+            self.price_store.merge(closes)
+
+        history = self.price_store.load(lookback_start, self.tickers)
+        return self._closes_to_prices(history)
+
+    @staticmethod
+    def _closes_to_prices(history: pd.DataFrame) -> pd.DataFrame:
+        """Transform long closes into prices.
 
-        # after using ffill to fill values when there was no price change
-        # during the trading session
-        # bfill fills values before the first occurance
-        # this provide an anchor value to calculate longer period
-        return prices.bfill()
+        After forward filling sessions without a price change, values before the
+        first close are back filled to provide an anchor for longer periods.
+
+        Args:
+            history (pd.DataFrame): cols('date', 'symbol', 'close')
+
+        Returns:
+            pd.DataFrame: float32 prices with index of dates and columns of stock prices
+
+        """
+        return PricePanel.from_closes(history).drop_empty().fill().to_frame()
 
     @staticmethod
     def get_symbol(
@@ -153,53 +352,17 @@ class WIGBot(TwitterBot):
             tries (int, optional): current try. Defaults to 0.
 
         Returns:
-            _type_: _description_
+            str: yahoo ticker
 
         Raises:
             ValueError: If YF doesn't return the necessary ticker after max_tries attempts.
 
         """
-        try:
-            data = yq.search(query)
-        except ValueError as e:  # Will catch JSONDecodeError
-            if tries >= max_tries:
-                msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
-                raise ValueError(msg) from e
-            return WIGBot.get_symbol(query, tries=tries + 1)
-        else:
-            quotes = data["quotes"]
-            if len(quotes) == 0:
-                if tries >= max_tries:
-                    msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
-                    raise ValueError(msg)
-                return WIGBot.get_symbol(query, tries=tries + 1)
-
-            symbol = quotes[0]["symbol"]
-            for quote in quotes:
-                if quote["exchange"] == preferred_exchange:
-                    symbol: str = quote["symbol"]
-                    break
-            return symbol
-
-    def _get_wig_components(self, retry: int = 20) -> pd.DataFrame:
-        # get data from source
-        tries = 0
-        while tries < retry:
-            try:
-                updated_components = pd.read_html(
-                    "https://gpwbenchmark.pl/ajaxindex.php?action=GPWIndexes&start=ajaxPortfolio&format=html&lang=EN&isin=PL9999999995&cmng_id=1011",
-                )[0]
-            except IncompleteRead:
-                tries += 1
-            else:  # if downloading data worked
-                break
-        else:  # downloading data failed every time
-            err = f"downloading wig components failed {retry} times"
-            logger.error(err)
-            sys.exit(1)
+        return search_symbol(query, preferred_exchange=preferred_exchange, max_tries=max_tries - tries)
 
-        updated_components = updated_components.iloc[:, :3]
-        updated_components.columns = ["company", "ISIN", "shares_num"]
+    def _get_wig_components(self) -> pd.DataFrame:
+        # get data from source, served from local snapshot between rebalances
+        updated_components = self.component_registry.get()
 
         saved_components = pd.read_csv(Path("data", "wig_comps.csv"))
 
@@ -220,39 +383,26 @@ class WIGBot(TwitterBot):
             full_components.industry = full_components.industry.replace(pretty_industry)
             return full_components
 
-        # get new ticker from Yahoo Finance
-        for indx, (
-            company,
-            isin,
-            yf_ticker,
-            sector,
-            industry,
-            _,
-        ) in empty_data.iterrows():
+        for company in empty_data.company:
             warn = f"Company {company} had missing data."
             logger.warning(warn)
 
-            if pd.isna(yf_ticker):
-                ticker = self.get_symbol(isin)
-                # add missing ticker
-                # use list-based .loc assignment to match pandas-stubs typing
-                full_components.loc[[indx], ["yf_ticker"]] = [ticker]
-            else:
-                ticker = yf_ticker
-
-            if pd.isna(sector) or pd.isna(industry):
-                # add missing sector and industry values
-                asset_profile = yq.Ticker(ticker).asset_profile[ticker]
-
-                # check for correct data returned
-                # new companies may have no sector/industry data
-                if not isinstance(asset_profile, dict):
-                    full_components.loc[[indx], ["sector", "industry"]] = [None, None]
-                else:
-                    full_components.loc[[indx], ["sector", "industry"]] = [
-                        asset_profile["sector"],
-                        asset_profile["industry"],
-                    ]
+        # get new tickers from Yahoo Finance
+        missing_ticker = empty_data.yf_ticker.isna()
+        if missing_ticker.any():
+            isins = empty_data.loc[missing_ticker, "ISIN"]
+            symbols = self.symbol_resolver.resolve_many(isins.to_list())
+            full_components.loc[isins.index, "yf_ticker"] = isins.map(symbols)
+
+        # add missing sector and industry values
+        missing_profile = empty_data.sector.isna() | empty_data.industry.isna()
+        if missing_profile.any():
+            tickers = full_components.loc[empty_data.index[missing_profile], "yf_ticker"]
+            asset_profiles = fetch_asset_profiles(tickers.to_list())
+            full_components.loc[tickers.index, ["sector", "industry"]] = [
+                [None, None] if profile is None else [profile.get("sector"), profile.get("industry")]
+                for profile in tickers.map(asset_profiles)
+            ]
 
         # save new csv with full WIG
         full_components.drop(columns="shares_num").to_csv(
@@ -264,6 +414,41 @@ class WIGBot(TwitterBot):
         full_components["ticker"] = full_components["yf_ticker"].str.removesuffix(".WA")
         return full_components
 
+    def _build_period_index(self) -> dict[str, tuple[int, int]]:
+        """Find start and end row of every period in prices.
+
+        Built once, so every period lookup is a dict access instead of masking self.ts.
+        Periods without enough data are left out.
+
+        Returns:
+            dict[str, tuple[int, int]]: period -> (start row, end row)
+
+        """
+        last = len(self.ts) - 1
+        this_year = (self.ts.year == self.today.year).to_numpy()
+
+        starts = {"1D": last - 1}
+
+        for period, column, value in (
+            ("1W", "week", self.today.week),
+            ("MTD", "month", self.today.month),
+            ("QTD", "quarter", self.today.quarter),
+        ):
+            rows = np.flatnonzero(this_year & (self.ts[column] == value).to_numpy())
+            if rows.size:
+                # start from the last session before the period
+                starts[period] = rows[0] - 1
+
+        previous_year = np.flatnonzero((self.ts.year == self.today.year - 1).to_numpy())
+        if previous_year.size:
+            starts["YTD"] = previous_year[-1]
+
+        starts["1Y"] = last - 252
+
+        return {
+            period: (max(int(starts[period]), 0), last) for period in self.PERIODS if period in starts and last > 0
+        }
+
     def get_periods_indicies(self, period: str = "1D") -> Index:
         """Get a start date and last date of some period to calculate returns.
 
@@ -274,56 +459,66 @@ class WIGBot(TwitterBot):
 
         Raises:
             NotImplementedError
+            ValueError: If there is not enough data for the period.
 
         Returns:
             Index: index to use with df.iloc
 
         """
-        if period == "YTD":
-            return self.ts.loc[self.ts[self.ts.year == self.today.year - 1].index.max() :].iloc[[0, -1]].index
-        if period == "MTD":
-            return (
-                self.ts.iloc[
-                    self.ts[(self.ts.year == self.today.year) & (self.ts.month == self.today.month)].index.min() - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "QTD":
-            return (
-                self.ts.iloc[
-                    self.ts[(self.ts.year == self.today.year) & (self.ts.quarter == self.today.quarter)].index.min()
-                    - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "1W":  # remember to do this on weekends!
-            return (
-                self.ts.iloc[
-                    self.ts[(self.ts.year == self.today.year) & (self.ts.week == self.today.week)].index.min() - 1 :
-                ]
-                .iloc[[0, -1]]
-                .index
-            )
-        if period == "1D":
-            return self.ts.iloc[[-2, -1]].index
-        if period == "1Y":
-            return self.ts.iloc[self.ts.index.max() - 252 :].iloc[[0, -1]].index
-        msg = f"period {period} not available"
-        raise NotImplementedError(msg)
+        if period not in self.PERIODS:
+            msg = f"period {period} not available"
+            raise NotImplementedError(msg)
+        if period not in self.period_index:
+            msg = f"not enough data for period {period}"
+            raise ValueError(msg)
+        return Index(self.period_index[period])
 
-    def is_trading_day(self) -> bool:
-        """Check if today was a trading day by looking at dates in downloaded data.
+    def get_returns_matrix(self, periods: Iterable[str] | None = None) -> pd.DataFrame:
+        """Calculate returns of all tickers for many periods at once.
+
+        Args:
+            periods (Iterable[str] | None, optional): periods to calculate. Defaults to None (all available).
 
         Returns:
-            bool
+            pd.DataFrame: returns with index of tickers and columns of periods
 
         """
-        return pd.Timestamp(datetime.now(tz=self.tzinfo).date()) in self.ts.date.to_list()
+        periods = list(self.period_index if periods is None else periods)
+        bounds = np.array([self.get_periods_indicies(period) for period in periods], dtype=np.intp).reshape(-1, 2)
+
+        values = self.prices.to_numpy()
+        returns = values[bounds[:, 1]] / values[bounds[:, 0]] - 1
+
+        return pd.DataFrame(returns.T, index=self.prices.columns, columns=periods)
+
+    def get_universe_returns(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Find members of all universes and calculate their returns for all periods at once.
+
+        Returns are weighted by current market cap, like the ones in tweets.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: membership with index of tickers and columns of universes,
+                returns with index of universes and columns of periods
+
+        """
+        tickers = self.returns.index
+        components = self.wig_components.set_index("ticker").reindex(tickers).rename_axis("ticker").reset_index()
+        mkt_cap = self.curr_prices.reindex(tickers).to_numpy(dtype=float) * components.shares_num.to_numpy(dtype=float)
+
+        masks = np.array([universe.mask(components, mkt_cap) for universe in self.universes.values()])
+        returns = universe_returns(masks, mkt_cap, self.returns.to_numpy(dtype=float))
+
+        return (
+            pd.DataFrame(masks.T, index=tickers, columns=list(self.universes)),
+            pd.DataFrame(returns, index=list(self.universes), columns=self.returns.columns),
+        )
 
     @staticmethod
-    def _prepare_tweet_text(data: pd.DataFrame, period: str) -> str:
+    def _prepare_tweet_text(
+        data: pd.DataFrame,
+        period: str,
+        hashtags: str = "#WIG #GPW #giełda #inwestycje #akcje",
+    ) -> str:
         """Prepare text for the tweet.
 
         Method for calculating data that will be on the tweet.
@@ -331,6 +526,7 @@ class WIGBot(TwitterBot):
         Args:
             data (pd.DataFrame): data to calculate sectors returns
             period (str): period to go to the tweet title
+            hashtags (str, optional): put at the end of the tweet. Defaults to "#WIG #GPW #giełda #inwestycje #akcje".
 
         Returns:
             str: text to directly put on the tweet
@@ -342,7 +538,7 @@ class WIGBot(TwitterBot):
             data.groupby("sector")["contribution"].sum() / data.groupby("sector")["mkt_cap"].sum()
         ).sort_values(ascending=False)
 
-        tweet_text = f"WIG Index {period} performance\n"
+        tweet_text = f"{data.universe.iloc[0]} Index {period} performance\n"
 
         tweet_text += (
             f"\n🟢 {data.ticker.iloc[0]} {data.company.iloc[0]} {data.returns.iloc[0]:.2%}\n"
@@ -360,21 +556,33 @@ class WIGBot(TwitterBot):
             else:
                 break
 
-        tweet_text += "\n#WIG #GPW #giełda #inwestycje #akcje"
+        tweet_text += f"\n{hashtags}"
 
         return tweet_text
 
-    def _prepare_data_for_heatmap_and_tweet(self, period: str) -> pd.DataFrame:
-        # calculate returns
-        indicies = self.get_periods_indicies(period)
-        data: pd.DataFrame = self.prices.iloc[indicies].pct_change().T.iloc[:, [-1]]
-        try:
-            data.columns = ["returns"]
-        except ValueError:
-            logger.exception(data)
-            logger.exception(self.prices)
+    def _prepare_data_for_heatmap_and_tweet(self, period: str, universe: str = "WIG") -> pd.DataFrame:
+        if period not in self.returns.columns:
+            logger.error("no returns calculated for period", extra={"period": period})
+            logger.error(self.prices)
             sys.exit(1)
 
+        return self._build_heatmap_data(self.returns[period], self.curr_prices, universe)
+
+    def _build_heatmap_data(self, returns: pd.Series, curr_prices: pd.Series, universe: str) -> pd.DataFrame:
+        """Join returns of a universe with its components.
+
+        Args:
+            returns (pd.Series): returns with index of tickers
+            curr_prices (pd.Series): prices at the end of the period with index of tickers
+            universe (str): name of the universe
+
+        Returns:
+            pd.DataFrame: data prepared for the heatmap and tweet, sorted by returns
+
+        """
+        members = self.universe_masks[universe].to_numpy()
+        data: pd.DataFrame = returns.loc[members].to_frame("returns")
+
         data = data.merge(
             self.wig_components.set_index("ticker"),
             right_index=True,
@@ -385,10 +593,11 @@ class WIGBot(TwitterBot):
         # columns 'company', 'ISIN', 'yf_ticker', 'sector', 'industry', 'shares_num', 'returns'
 
         data = data.drop(columns=["ISIN", "yf_ticker"])
-        data["curr_prices"] = self.curr_prices
+        data["curr_prices"] = curr_prices
 
         data["mkt_cap"] = data["curr_prices"] * data["shares_num"]
-        data["WIG"] = "WIG"
+        # root of the treemap and name in the title
+        data["universe"] = universe
         data = data.reset_index().rename({"index": "ticker"}, axis=1).sort_values("returns", ascending=False)
 
         # check for nans in dataframe
@@ -408,198 +617,300 @@ class WIGBot(TwitterBot):
         Args:
             data (pd.DataFrame): cols(
                 'ticker', 'company', 'sector', 'industry',
-                'shares_num', 'returns', 'curr_prices', 'mkt_cap'
+                'shares_num', 'returns', 'curr_prices', 'mkt_cap', 'universe'
             )
             path (str): filename with extension
             period (str): used only for title
 
         """
-        font = "Times New Roman"
-
-        if period == "1W":
-            additional_info = f" ⁕ {self.today.week}W{self.today.year}"
-        elif period == "MTD":
-            additional_info = f" ⁕ {self.today.month}M{self.today.year}"
-        elif period == "QTD":
-            additional_info = f" ⁕ {self.today.quarter}Q{self.today.year}"
-        else:  # 1D, YTD, 1Y
-            additional_info = ""
-
-        # colour bounds for different periods
-        bounds = {
-            "1D": 0.03,
-            "1W": 0.1,
-            "MTD": 0.2,
-            "QTD": 0.3,
-            "YTD": 0.5,
-            "1Y": 0.5,
-        }
+        chart_heatmap(data, path, period, datetime.now(self.tzinfo), renderer=self.renderer)
 
-        fig = px.treemap(
-            data,
-            path=["WIG", "sector", "ticker"],
-            values="mkt_cap",
-            color="returns",
-            color_continuous_scale=["#CC0000", "#292929", "#00CC00"],
-            custom_data=data[["returns", "company", "ticker", "curr_prices", "sector"]],
-        )
+    @staticmethod
+    def _slug(universe: str) -> str:
+        return re.sub(r"\W+", "_", universe).lower()
 
-        fig.update_traces(
-            insidetextfont={"size": 140, "family": font},
-            textfont={"size": 60, "family": font},
-            textposition="middle center",
-            texttemplate="<br>%{customdata[2]}<br>    <b>%{customdata[0]:.2%}</b>     <br><sup><i>%{customdata[3]:.2f} zł</i><br></sup>",  # noqa: E501
-            marker={
-                "cornerradius": 25,
-                "line_width": 3,
-                "line_color": "#2e2e2e",
-            },
-        )
+    def heatmap_and_tweet_text(self, period: str, universe: str = "WIG") -> tuple[str, str]:
+        """Calculate necessary data and prepares heatmap and text for the tweet.
 
-        fig.update_coloraxes(
-            showscale=True,
-            cmin=-bounds[period],
-            cmax=bounds[period],
-            cmid=0,
-            colorbar={
-                "title_text": "",
-                "thickness": 175,
-                "orientation": "h",
-                "y": 1.035,
-                "tickfont": {
-                    "color": "white",
-                    "size": 125,
-                    "family": font,
-                },
-                "ticklabelposition": "inside",
-                "tickvals": [-bounds[period] * 0.95, bounds[period] * 0.95],
-                "ticktext": [f"{-bounds[period]:.0%}", f"{bounds[period]:.0%}"],
-            },
-        )
+        Returns:
+            tuple[str, str]: path to picture and tweet text
 
-        fig.update_layout(
-            margin={"t": 350, "l": 5, "r": 5, "b": 120},
-            width=7680,
-            height=4320,
-            title={
-                "text": f"INDEX WIG<br><sup>{period} performance{additional_info} ⁕ {datetime.now(self.tzinfo):%Y/%m/%d}</sup>",  # noqa: E501
-                "font": {"color": "white", "size": 170, "family": font},
-                "yanchor": "middle",
-                "xanchor": "center",
-                "xref": "paper",
-                "yref": "paper",
-                "x": 0.5,
-                "pad": {"t": 100, "b": 100},
-            },
-            paper_bgcolor="#1a1a1a",
-        )
+        """
+        data = self._prepare_data_for_heatmap_and_tweet(period=period, universe=universe)
+
+        path = f"{self._slug(universe)}_heatmap_{period}.png"
+        self.chart_heatmap(data, path, period)
+
+        # text for the tweet
+        tweet_text = self._prepare_tweet_text(data, period=period, hashtags=self.universes[universe].hashtags)
+
+        return (path, tweet_text)
+
+    # archive of heatmaps
+
+    def backfill(
+        self,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        periods: Iterable[str] | None = None,
+        out_dir: Path = Path("backfill"),
+    ) -> list[Path]:
+        """Render heatmaps of past sessions into a directory, without posting.
+
+        Returns of all (session, period) pairs are calculated in one pass over
+        the price panel and heatmaps are rendered by the worker pool. Heatmaps
+        already in out_dir are not rendered again.
 
-        fig.add_annotation(
-            text=("source: YahooFinance!"),
-            x=0.90,
-            y=-0.023,
-            font={"family": font, "size": 80, "color": "white"},
-            opacity=0.7,
-            align="left",
+        Args:
+            start (pd.Timestamp): first session
+            end (pd.Timestamp): last session
+            periods (Iterable[str] | None, optional): periods to render. Defaults to None (all).
+            out_dir (Path, optional): directory for heatmaps. Defaults to Path("backfill").
+
+        Returns:
+            list[Path]: rendered heatmaps
+
+        """
+        periods = list(self.PERIODS if periods is None else periods)
+        end_rows = np.flatnonzero((self.prices.index >= start) & (self.prices.index <= end))
+        if not end_rows.size:
+            logger.warning("no sessions to backfill", extra={"start": start, "end": end})
+            return []
+
+        values = self.prices.to_numpy()
+        returns = period_returns(values, period_bounds(self.prices.index, end_rows, periods))
+        logger.info(
+            "calculated backfill returns",
+            extra={"sessions": len(end_rows), "periods": periods, "universes": self.post_universes},
         )
 
-        fig.add_annotation(
-            text=(datetime.now(self.tzinfo).strftime(r"%Y/%m/%d %H:%M")),
-            x=0.1,
-            y=-0.025,
-            font={"family": font, "size": 80, "color": "white"},
-            opacity=0.7,
-            align="left",
+        out_dir.mkdir(parents=True, exist_ok=True)
+        jobs = []
+        for i, row in enumerate(end_rows):
+            session = self.prices.index[row]
+            # charts are dated like the ones posted after the session
+            now = self.tzinfo.localize(datetime.combine(session.date(), SESSION_CLOSE))
+            curr_prices = pd.Series(values[row], index=self.prices.columns)
+
+            for j, period in enumerate(periods):
+                if np.isnan(returns[i, j]).all():
+                    logger.warning("not enough data", extra={"session": session, "period": period})
+                    continue
+
+                ticker_returns = pd.Series(returns[i, j], index=self.prices.columns)
+                for universe in self.post_universes:
+                    if not self.universe_masks[universe].any():
+                        continue
+                    path = out_dir / f"{session:%Y_%m_%d}_{self._slug(universe)}_heatmap_{period}.png"
+                    if path.exists():
+                        continue
+                    data = self._build_heatmap_data(ticker_returns, curr_prices, universe)
+                    jobs.append(RenderJob(data, str(path), period, now))
+
+        rendered = render_heatmaps(
+            jobs,
+            max_workers=self.RENDER_WORKERS,
+            timeout=self.RENDER_TIMEOUT,
+            renderer=self.renderer,
         )
+        paths = [Path(job.path) for job, is_rendered in zip(jobs, rendered, strict=True) if is_rendered]
+        logger.info("backfill complete", extra={"rendered": len(paths), "failed": len(jobs) - len(paths)})
+        return paths
+
+    # intraday heatmaps
+
+    @staticmethod
+    def _download_quotes(symbols: list[str]) -> dict:
+        return yq.Ticker(symbols, asynchronous=True, max_workers=4, progress=False, timeout=20).price
+
+    def _fetch_quotes(self) -> pd.Series:
+        """Download current prices of WIG components.
+
+        Returns:
+            pd.Series: prices with index of tickers, only for tickers YF returned a price of
 
-        fig.add_annotation(
-            text=("@SliwinskiAlan"),
-            x=0.5,
-            y=-0.025,
-            font={"family": font, "size": 80, "color": "white"},
-            opacity=0.7,
-            align="left",
+        """
+        quotes = self.replay.call(
+            Replay.make_key("yahoo_quotes", sorted(self.tickers)),
+            self._download_quotes,
+            self.tickers,
         )
 
-        fig.write_image(path)
+        prices = {
+            symbol.removesuffix(".WA"): quote["regularMarketPrice"]
+            for symbol, quote in quotes.items()
+            if isinstance(quote, dict) and isinstance(quote.get("regularMarketPrice"), int | float)
+        }
+        return pd.Series(prices, dtype=PricePanel.DTYPE)
+
+    def _start_live_session(self) -> None:
+        """Prepare prices to be updated in place.
 
-    def heatmap_and_tweet_text(self, period: str) -> tuple[str, str]:
-        """Calculate necessary data and prepares heatmap and text for the tweet.
+        Adds a row for today's session, starting at the previous close, if
+        downloaded history has none yet. Everything except 1D returns and
+        current prices is calculated here once for the whole session.
+        """
+        session = pd.Timestamp(datetime.now(self.tzinfo).date())
+        dates = self.prices.index
+        values = self.prices.to_numpy(dtype=PricePanel.DTYPE, copy=True)
+        if dates[-1] < session:
+            dates = dates.append(pd.DatetimeIndex([session], name="date"))
+            values = np.vstack([values, values[-1:]])
+
+        self.panel = PricePanel(dates, self.prices.columns, values)
+        self._set_prices(self.panel.to_frame())
+        self.curr_prices = pd.Series(self.panel.values[-1], index=self.panel.tickers, copy=False)
+
+        components = self.wig_components.set_index("ticker")
+        self._live_shares_num = components.shares_num.reindex(self.panel.tickers).to_numpy(dtype=float)
+        self._live_masks = self.universe_masks.to_numpy().T
+
+    def _refresh_live(self, quotes: pd.Series) -> int:
+        """Write current prices to today's row and update 1D returns.
+
+        Args:
+            quotes (pd.Series): current prices with index of tickers
 
         Returns:
-            tuple[str, str]: path to picture and tweet text
+            int: number of updated tickers
 
         """
-        data = self._prepare_data_for_heatmap_and_tweet(period=period)
+        columns = self.panel.tickers.get_indexer(quotes.index)
+        found = columns >= 0
+        values = self.panel.values
+        values[-1, columns[found]] = quotes.to_numpy()[found]
 
-        path = f"wig_heatmap_{period}.png"
-        self.chart_heatmap(data, path, period)
+        # previous close, share counts, sectors and memberships stay as they are
+        returns = values[-1] / values[-2] - 1
+        self.returns["1D"] = returns
+        self.universe_returns["1D"] = universe_returns(
+            self._live_masks,
+            values[-1] * self._live_shares_num,
+            returns[:, None].astype(float),
+        )[:, 0]
 
-        # text for the tweet
-        tweet_text = self._prepare_tweet_text(data, period=period)
+        return int(found.sum())
 
-        return (path, tweet_text)
+    def run_live(self, interval: timedelta | None = None, budget: float | None = None) -> None:
+        """Refresh 1D heatmaps of all universes until the session closes.
+
+        Heatmaps are saved as live_<universe>_heatmap_1D.png and are not posted.
+
+        Args:
+            interval (timedelta | None, optional): time between refreshes. Defaults to None (LIVE_INTERVAL).
+            budget (float | None, optional): seconds a refresh may take. Defaults to None (LIVE_BUDGET).
+
+        """
+        interval = self.LIVE_INTERVAL if interval is None else interval
+        budget = self.LIVE_BUDGET if budget is None else budget
+
+        if not self.plan:
+            logger.info("session is closed, nothing to refresh")
+            return
+
+        self._start_live_session()
+        logger.info("starting live mode", extra={"interval_seconds": interval.total_seconds(), "budget": budget})
+
+        while is_session_open(datetime.now(self.tzinfo)):
+            cycle_start = time.perf_counter()
+            timings = {}
+
+            quotes = self._fetch_quotes()
+            timings["fetch"] = time.perf_counter() - cycle_start
+
+            updated = self._refresh_live(quotes)
+            timings["update"] = time.perf_counter() - cycle_start - sum(timings.values())
+
+            for universe in self.post_universes:
+                data = self._prepare_data_for_heatmap_and_tweet(period="1D", universe=universe)
+                self.chart_heatmap(data, f"live_{self._slug(universe)}_heatmap_1D.png", "1D")
+            timings["render"] = time.perf_counter() - cycle_start - sum(timings.values())
+
+            elapsed = time.perf_counter() - cycle_start
+            logger.info(
+                "live cycle",
+                extra={
+                    "updated_tickers": updated,
+                    "seconds": round(elapsed, 3),
+                    **{f"{stage}_seconds": round(seconds, 3) for stage, seconds in timings.items()},
+                },
+            )
+            if elapsed > budget:
+                logger.warning("live cycle over budget", extra={"seconds": round(elapsed, 3), "budget": budget})
+
+            time.sleep(max(interval.total_seconds() - elapsed, 0))
+
+        logger.info("session closed, stopping live mode")
 
     def run(self) -> None:
         """Run twitter bot.
 
-        Make calculations, heatmaps and post them to twitter.
+        Make calculations, render all heatmaps due today in parallel and post them to twitter.
         """
         logger.info("running main function")
 
-        # post daily heatmap
-        if self.is_trading_day():
-            logger.info("posting daily heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("1D")
-            self.make_tweet(tweet_string, [path])
-            logger.info("tweeted successfully")
-        else:
-            logger.info("today was not a trading day")
-
-        saturday_in_week = 5
-        # on saturday post 1w performance
-        if self.today.weekday() == saturday_in_week:
-            logger.info("posting weekly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("1W")
-            self.make_tweet(tweet_string, [path])
-            logger.info("tweeted successfully")
-        else:
-            logger.info("not posting weekly heatmap")
-
-        # on last day of the month post 1m performance
-        if self.today.is_month_end:
-            logger.info("posting monthly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("MTD")
-            self.make_tweet(tweet_string, [path])
-            logger.info("tweeted successfully")
-        else:
-            logger.info("not posting monthly heatmap")
-
-        # on last day of the quarter post 1q performance
-        if self.today.is_quarter_end:
-            logger.info("posting quarterly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("QTD")
-            self.make_tweet(tweet_string, [path])
-            logger.info("tweeted successfully")
-        else:
-            logger.info("not posting quarterly heatmap")
-
-        # on last day of the year post 1y performance
-        if self.today.is_year_end:
-            logger.info("posting yearly heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("YTD")
-            self.make_tweet(tweet_string, [path])
-            logger.info("tweeted successfully")
-        else:
-            logger.info("not posting yearly heatmap")
-
-        # choose randomly a day to post ytd performance
-        # 24 out of 360, so on average every 15 days
-        rng = np.random.default_rng()
-        if rng.random() < 24 / 360:
-            logger.info("posting ytd heatmap")
-            path, tweet_string = self.heatmap_and_tweet_text("YTD")
-            self.make_tweet(tweet_string, [path])
+        if not self.plan:
+            logger.info("nothing to post today")
+            return
+
+        # charts are stamped with the close of today's session instead of the time of the run,
+        # so a run repeated after a failed post finds its heatmaps in the cache
+        now = self.tzinfo.localize(datetime.combine(self.today.date(), SESSION_CLOSE))
+        jobs: dict[str, RenderJob] = {}
+        posts = []
+        for period in self.plan:
+            # the calendar does not know if yahoo already has today's closes
+            if period == "1D" and self.prices.index[-1].date() != self.today.date():
+                logger.warning(
+                    "skipping daily heatmap, today's session is not in prices",
+                    extra={"last_price_date": self.prices.index[-1].date(), "today": self.today.date()},
+                )
+                continue
+
+            for universe in self.post_universes:
+                if not self.universe_masks[universe].any():
+                    logger.warning("skipping universe without components", extra={"universe": universe})
+                    continue
+
+                data = self._prepare_data_for_heatmap_and_tweet(period=period, universe=universe)
+                tweet_text = self._prepare_tweet_text(
+                    data.copy(),
+                    period=period,
+                    hashtags=self.universes[universe].hashtags,
+                )
+
+                # the same heatmap can be due twice, or already rendered by a failed run
+                key = self.render_cache.make_key(data, period, now)
+                if key not in jobs and self.render_cache.get(key) is None:
+                    jobs[key] = RenderJob(data, str(self.render_cache.staging_path_for(key)), period, now)
+                posts.append((period, universe, key, tweet_text))
+
+        rendered = render_heatmaps(
+            list(jobs.values()),
+            max_workers=self.RENDER_WORKERS,
+            timeout=self.RENDER_TIMEOUT,
+            renderer=self.renderer,
+        )
+        for key, is_rendered in zip(jobs, rendered, strict=True):
+            if is_rendered:
+                self.render_cache.commit(key)
+
+        for period, universe, key, tweet_text in posts:
+            path = self.render_cache.path_for(key)
+            if not path.exists():
+                logger.error("skipping post without heatmap", extra={"period": period, "universe": universe})
+                continue
+
+            logger.info(
+                "posting heatmap",
+                extra={
+                    "period": period,
+                    "universe": universe,
+                    "universe_return": self.universe_returns.loc[universe, period],
+                },
+            )
+            # cached heatmaps are removed only by cache eviction
+            self.make_tweet(tweet_text, [str(path)], delete_pictures=False)
             logger.info("tweeted successfully")
-        else:
-            logger.info("not posting ytd heatmap")
+
+        self.render_cache.evict()
@@ -0,0 +1,185 @@
+"""Registry of WIG components.
+
+Index composition and share counts change only at rebalances, so the last
+downloaded portfolio is kept on disk and served until it expires.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import UTC, datetime, timedelta
+from http.client import IncompleteRead
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+import requests
+from mylogging import setup
+from twitter_bot_base import get_replay
+
+logger = setup(__name__, __file__)
+
+
+class ComponentRegistry:
+    """Snapshot of WIG portfolio from gpwbenchmark with a time to live.
+
+    Attributes:
+        root (Path): directory with snapshot and its metadata
+        ttl (timedelta): how long snapshot is served without asking gpwbenchmark
+        max_tries (int): how many times to try to download portfolio
+        backoff (float): seconds to wait after the first failed try, doubled after every next one
+        added (set[str]): ISINs added to the index by the last refresh
+        removed (set[str]): ISINs removed from the index by the last refresh
+
+    """
+
+    URL = "https://gpwbenchmark.pl/ajaxindex.php?action=GPWIndexes&start=ajaxPortfolio&format=html&lang=EN&isin=PL9999999995&cmng_id=1011"  # noqa: E501
+
+    def __init__(
+        self,
+        root: Path = Path("data"),
+        ttl: timedelta = timedelta(days=7),
+        max_tries: int = 5,
+        backoff: float = 2.0,
+    ) -> None:
+        self.root = root
+        self.ttl = ttl
+        self.max_tries = max_tries
+        self.backoff = backoff
+        self.added: set[str] = set()
+        self.removed: set[str] = set()
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self.root / "wig_snapshot.csv"
+
+    @property
+    def meta_path(self) -> Path:
+        return self.root / "wig_snapshot.json"
+
+    def _read_meta(self) -> dict | None:
+        if not (self.meta_path.exists() and self.snapshot_path.exists()):
+            return None
+        with self.meta_path.open(encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp_path = self.meta_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+        os.replace(tmp_path, self.meta_path)
+
+    def _load_snapshot(self) -> pd.DataFrame:
+        return pd.read_csv(self.snapshot_path)
+
+    def _save_snapshot(self, components: pd.DataFrame) -> None:
+        tmp_path = self.snapshot_path.with_suffix(".csv.tmp")
+        components.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _fetch(self, meta: dict | None) -> requests.Response | None:
+        # ask only for changes if the server supports validators
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        for tries in range(self.max_tries):
+            try:
+                response = get_replay().call(
+                    "gpwbenchmark_portfolio",
+                    requests.get,
+                    self.URL,
+                    headers=headers,
+                    timeout=30,
+                )
+                response.raise_for_status()
+            except (requests.RequestException, IncompleteRead):
+                delay = self.backoff * 2**tries
+                logger.warning(
+                    "downloading wig components failed",
+                    extra={"try": tries + 1, "retry_in_seconds": delay},
+                )
+                if tries + 1 < self.max_tries:
+                    time.sleep(delay)
+            else:
+                return response
+        return None
+
+    @staticmethod
+    def _parse(html: str) -> pd.DataFrame:
+        components = pd.read_html(StringIO(html))[0].iloc[:, :3]
+        components.columns = ["company", "ISIN", "shares_num"]
+        return components
+
+    @staticmethod
+    def diff(old: pd.DataFrame, new: pd.DataFrame) -> tuple[set[str], set[str]]:
+        """Compare two portfolios.
+
+        Args:
+            old (pd.DataFrame): previous portfolio
+            new (pd.DataFrame): current portfolio
+
+        Returns:
+            tuple[set[str], set[str]]: ISINs added and removed
+
+        """
+        old_isins, new_isins = set(old.ISIN), set(new.ISIN)
+        return new_isins - old_isins, old_isins - new_isins
+
+    def get(self) -> pd.DataFrame:
+        """Get WIG portfolio.
+
+        Serves snapshot while it is fresh, otherwise refreshes it from gpwbenchmark.
+        Falls back to an expired snapshot if gpwbenchmark is not available.
+
+        Returns:
+            pd.DataFrame: cols('company', 'ISIN', 'shares_num')
+
+        """
+        meta = self._read_meta()
+        now = datetime.now(UTC)
+
+        if meta is not None and now - datetime.fromisoformat(meta["fetched_at"]) < self.ttl:
+            logger.info("using cached wig components", extra={"fetched_at": meta["fetched_at"]})
+            return self._load_snapshot()
+
+        response = self._fetch(meta)
+        if response is None:
+            if meta is not None:
+                logger.warning("using expired wig components", extra={"fetched_at": meta["fetched_at"]})
+                return self._load_snapshot()
+            err = f"downloading wig components failed {self.max_tries} times"
+            logger.error(err)
+            sys.exit(1)
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        new_meta = {
+            "fetched_at": now.isoformat(),
+            "sha256": content_hash,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+        not_modified = 304
+        if meta is not None and (response.status_code == not_modified or meta["sha256"] == content_hash):
+            logger.info("wig components did not change")
+            self._write_meta({**meta, "fetched_at": now.isoformat()})
+            return self._load_snapshot()
+
+        components = self._parse(response.text)
+        if meta is not None:
+            self.added, self.removed = self.diff(self._load_snapshot(), components)
+            logger.info(
+                "wig components changed",
+                extra={"added": sorted(self.added), "removed": sorted(self.removed)},
+            )
+
+        self._save_snapshot(components)
+        self._write_meta(new_meta)
+
+        return components
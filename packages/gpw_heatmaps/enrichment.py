@@ -0,0 +1,150 @@
+"""Enrichment of new WIG components with data from YahooFinance.
+
+ISINs are resolved to yahoo tickers concurrently and memoized on disk,
+asset profiles of all new components are fetched in one batched call.
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import yahooquery as yq
+from mylogging import setup
+from twitter_bot_base import Replay, get_replay
+
+logger = setup(__name__, __file__)
+
+
+def search_symbol(
+    query: str,
+    preferred_exchange: str = "WSE",
+    max_tries: int = 5,
+    backoff: float = 1.0,
+) -> str:
+    """Get ticker.
+
+    Searches Yahoo Finance for a ticker by other identifier.
+
+    Args:
+        query (str): some identifier
+        preferred_exchange (str, optional): what exchange to prioritize. Defaults to "WSE".
+        max_tries (int, optional): how many times to try to get the ticker. Defaults to 5.
+        backoff (float, optional): seconds to wait after the first failed try,
+            doubled after every next one. Defaults to 1.0.
+
+    Returns:
+        str: yahoo ticker
+
+    Raises:
+        ValueError: If YF doesn't return the necessary ticker after max_tries attempts.
+
+    """
+    for tries in range(max_tries):
+        try:
+            quotes = get_replay().call(Replay.make_key("yahoo_search", query), yq.search, query)["quotes"]
+        except ValueError:  # Will catch JSONDecodeError
+            quotes = []
+
+        if quotes:
+            for quote in quotes:
+                if quote["exchange"] == preferred_exchange:
+                    return quote["symbol"]
+            return quotes[0]["symbol"]
+
+        if tries + 1 < max_tries:
+            time.sleep(backoff * 2**tries)
+
+    msg = f"YahooFinance have not returned the necessary ticker\n{query = }"
+    raise ValueError(msg)
+
+
+class SymbolResolver:
+    """Resolves ISINs to yahoo tickers, remembering every result on disk.
+
+    Attributes:
+        path (Path): json file with ISIN -> ticker
+        max_workers (int): how many searches run at once
+        symbols (dict[str, str]): memoized ISIN -> ticker
+
+    """
+
+    def __init__(self, path: Path = Path("data", "isin_symbols.json"), max_workers: int = 4) -> None:
+        self.path = path
+        self.max_workers = max_workers
+
+        self.symbols: dict[str, str] = {}
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                self.symbols = json.load(f)
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.symbols, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def resolve_many(self, isins: list[str]) -> dict[str, str]:
+        """Resolve ISINs to yahoo tickers.
+
+        Args:
+            isins (list[str]): ISINs to resolve
+
+        Returns:
+            dict[str, str]: ISIN -> ticker
+
+        Raises:
+            ValueError: If any ISIN could not be resolved. Resolved ones are remembered anyway.
+
+        """
+        missing = sorted({isin for isin in isins if isin not in self.symbols})
+
+        if missing:
+            logger.info("searching for tickers", extra={"isins": missing})
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {isin: executor.submit(search_symbol, isin) for isin in missing}
+                for isin, future in futures.items():
+                    try:
+                        self.symbols[isin] = future.result()
+                    except ValueError:
+                        logger.exception("failed to find ticker", extra={"isin": isin})
+                        failed.append(isin)
+
+            self._save()
+
+            if failed:
+                msg = f"YahooFinance have not returned the necessary tickers\n{failed = }"
+                raise ValueError(msg)
+
+        return {isin: self.symbols[isin] for isin in isins}
+
+
+def _download_asset_profiles(tickers: list[str]) -> dict:
+    return yq.Ticker(tickers, asynchronous=True, max_workers=4, progress=False).asset_profile
+
+
+def fetch_asset_profiles(tickers: list[str]) -> dict[str, dict | None]:
+    """Get asset profiles of many tickers in one request.
+
+    Args:
+        tickers (list[str]): yahoo tickers
+
+    Returns:
+        dict[str, dict | None]: ticker -> asset profile, None if YF has no profile
+
+    """
+    if not tickers:
+        return {}
+
+    profiles = get_replay().call(
+        Replay.make_key("yahoo_asset_profile", sorted(tickers)),
+        _download_asset_profiles,
+        tickers,
+    )
+
+    # new companies may have no sector/industry data
+    # then YF returns an error message instead of a dict
+    return {ticker: profile if isinstance(profile := profiles.get(ticker), dict) else None for ticker in tickers}
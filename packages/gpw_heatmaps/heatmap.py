@@ -0,0 +1,221 @@
+"""WIG heatmap chart.
+
+Kept apart from the bot, so charts can be rendered in worker processes
+without authenticating or downloading anything.
+"""
+
+from datetime import datetime
+
+import pandas as pd
+from plotly.graph_objects import Figure, Treemap
+from renderer import HeatmapRenderer
+from treemap_layout import TreemapLayout, get_layout
+
+FONT = "Times New Roman"
+COLOR_SCALE = ["#CC0000", "#292929", "#00CC00"]
+WIDTH = 7680
+HEIGHT = 4320
+
+# colour bounds for different periods
+BOUNDS = {
+    "1D": 0.03,
+    "1W": 0.1,
+    "MTD": 0.2,
+    "QTD": 0.3,
+    "YTD": 0.5,
+    "1Y": 0.5,
+}
+
+
+def timestamp_text(now: datetime) -> str:
+    """Get time of the chart as shown on the heatmap.
+
+    Args:
+        now (datetime): date of the chart, tz-aware
+
+    Returns:
+        str: date with hours and minutes
+
+    """
+    return now.strftime(r"%Y/%m/%d %H:%M")
+
+
+def style_params() -> dict:
+    """Get parameters that change the look of the heatmap.
+
+    Returns:
+        dict: style parameters, used to tell apart renders of the same data
+
+    """
+    return {
+        "font": FONT,
+        "color_scale": COLOR_SCALE,
+        "width": WIDTH,
+        "height": HEIGHT,
+        "bounds": BOUNDS,
+        "layout": "stable",
+    }
+
+
+def make_heatmap_figure(
+    data: pd.DataFrame,
+    period: str,
+    now: datetime,
+    layout: TreemapLayout | None = None,
+) -> Figure:
+    """Create heatmap figure of an index.
+
+    Args:
+        data (pd.DataFrame): cols(
+            'ticker', 'company', 'sector', 'industry',
+            'shares_num', 'returns', 'curr_prices', 'mkt_cap', 'universe'
+        )
+        period (str): used only for title
+        now (datetime): date of the chart, tz-aware
+        layout (TreemapLayout | None, optional): tiles to colour.
+            Defaults to None (saved layout of the index composition).
+
+    Returns:
+        Figure: ready to save heatmap
+
+    """
+    today = pd.Timestamp(now)
+
+    if period == "1W":
+        additional_info = f" ⁕ {today.week}W{today.year}"
+    elif period == "MTD":
+        additional_info = f" ⁕ {today.month}M{today.year}"
+    elif period == "QTD":
+        additional_info = f" ⁕ {today.quarter}Q{today.year}"
+    else:  # 1D, YTD, 1Y
+        additional_info = ""
+
+    index_name = data.universe.iloc[0]
+    if layout is None:
+        layout = get_layout(data)
+
+    # tiles come from the layout as they are, only colours and texts are new
+    colors, customdata = layout.node_data(data)
+    leaf_template = "<br>%{customdata[2]}<br>    <b>%{customdata[0]:.2%}</b>     <br><sup><i>%{customdata[3]:.2f} zł</i><br></sup>"  # noqa: E501
+
+    fig = Figure(
+        Treemap(
+            ids=layout.ids,
+            labels=layout.labels,
+            parents=layout.parents,
+            values=layout.values,
+            branchvalues="total",
+            sort=False,
+            customdata=customdata,
+            marker={"colors": colors, "coloraxis": "coloraxis"},
+        ),
+    )
+
+    fig.update_traces(
+        insidetextfont={"size": 140, "family": FONT},
+        textfont={"size": 60, "family": FONT},
+        textposition="middle center",
+        texttemplate=["%{label}"] * layout.n_parents + [leaf_template] * len(layout.tickers),
+        marker={
+            "cornerradius": 25,
+            "line_width": 3,
+            "line_color": "#2e2e2e",
+        },
+    )
+
+    fig.update_coloraxes(
+        colorscale=COLOR_SCALE,
+        showscale=True,
+        cmin=-BOUNDS[period],
+        cmax=BOUNDS[period],
+        cmid=0,
+        colorbar={
+            "title_text": "",
+            "thickness": 175,
+            "orientation": "h",
+            "y": 1.035,
+            "tickfont": {
+                "color": "white",
+                "size": 125,
+                "family": FONT,
+            },
+            "ticklabelposition": "inside",
+            "tickvals": [-BOUNDS[period] * 0.95, BOUNDS[period] * 0.95],
+            "ticktext": [f"{-BOUNDS[period]:.0%}", f"{BOUNDS[period]:.0%}"],
+        },
+    )
+
+    fig.update_layout(
+        margin={"t": 350, "l": 5, "r": 5, "b": 120},
+        width=WIDTH,
+        height=HEIGHT,
+        title={
+            "text": f"INDEX {index_name}<br><sup>{period} performance{additional_info} ⁕ {now:%Y/%m/%d}</sup>",
+            "font": {"color": "white", "size": 170, "family": FONT},
+            "yanchor": "middle",
+            "xanchor": "center",
+            "xref": "paper",
+            "yref": "paper",
+            "x": 0.5,
+            "pad": {"t": 100, "b": 100},
+        },
+        paper_bgcolor="#1a1a1a",
+    )
+
+    fig.add_annotation(
+        text=("source: YahooFinance!"),
+        x=0.90,
+        y=-0.023,
+        font={"family": FONT, "size": 80, "color": "white"},
+        opacity=0.7,
+        align="left",
+    )
+
+    fig.add_annotation(
+        text=timestamp_text(now),
+        x=0.1,
+        y=-0.025,
+        font={"family": FONT, "size": 80, "color": "white"},
+        opacity=0.7,
+        align="left",
+    )
+
+    fig.add_annotation(
+        text=("@SliwinskiAlan"),
+        x=0.5,
+        y=-0.025,
+        font={"family": FONT, "size": 80, "color": "white"},
+        opacity=0.7,
+        align="left",
+    )
+
+    return fig
+
+
+def chart_heatmap(
+    data: pd.DataFrame,
+    path: str,
+    period: str,
+    now: datetime,
+    renderer: HeatmapRenderer | None = None,
+) -> str:
+    """Save wig heatmap.
+
+    Args:
+        data (pd.DataFrame): data prepared for the heatmap
+        path (str): filename with extension
+        period (str): used only for title
+        now (datetime): date of the chart, tz-aware
+        renderer (HeatmapRenderer | None, optional): warm renderer to export with.
+            Defaults to None (one-off kaleido session).
+
+    Returns:
+        str: path to saved picture
+
+    """
+    fig = make_heatmap_figure(data, period, now)
+    if renderer is None:
+        fig.write_image(path)
+    else:
+        renderer.write(fig, path)
+    return path
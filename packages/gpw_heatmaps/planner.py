@@ -0,0 +1,178 @@
+"""Schedule of heatmap posts.
+
+Decides which heatmaps are due on a given date from the GPW session
+calendar alone, so days without posts end before anything is downloaded.
+"""
+
+from datetime import date, datetime, time, timedelta
+from functools import cache
+
+import numpy as np
+import pandas as pd
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+# (month, day) of holidays with a fixed date when GPW has no session
+FIXED_HOLIDAYS = (
+    (1, 1),  # New Year's Day
+    (1, 6),  # Epiphany
+    (5, 1),  # Labour Day
+    (5, 3),  # Constitution Day
+    (8, 15),  # Assumption Day
+    (11, 1),  # All Saints' Day
+    (11, 11),  # Independence Day
+    (12, 24),  # Christmas Eve
+    (12, 25),  # Christmas Day
+    (12, 26),  # Second Day of Christmas
+    (12, 31),  # New Year's Eve
+)
+# days after Easter Sunday of movable holidays when GPW has no session
+EASTER_OFFSETS = (
+    -2,  # Good Friday
+    1,  # Easter Monday
+    60,  # Corpus Christi
+)
+# from the start of continuous trading to the end of the closing auction, Warsaw time
+SESSION_OPEN = time(9, 0)
+SESSION_CLOSE = time(17, 5)
+
+
+def easter_sunday(year: int) -> date:
+    """Calculate date of Easter Sunday with the anonymous Gregorian algorithm.
+
+    Args:
+        year (int): year
+
+    Returns:
+        date: Easter Sunday
+
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7  # noqa: E741
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@cache
+def gpw_holidays(year: int) -> frozenset[date]:
+    """Get weekdays without a session on GPW.
+
+    Args:
+        year (int): year
+
+    Returns:
+        frozenset[date]: holidays
+
+    """
+    easter = easter_sunday(year)
+    return frozenset(
+        [date(year, month, day) for month, day in FIXED_HOLIDAYS]
+        + [easter + timedelta(days=offset) for offset in EASTER_OFFSETS],
+    )
+
+
+def is_trading_day(day: date) -> bool:
+    """Check if there is a session on GPW.
+
+    Args:
+        day (date): date to check
+
+    Returns:
+        bool
+
+    """
+    saturday_in_week = 5
+    return day.weekday() < saturday_in_week and day not in gpw_holidays(day.year)
+
+
+def last_session(day: date) -> date:
+    """Find the last session on GPW on or before a date.
+
+    Args:
+        day (date): date to look back from
+
+    Returns:
+        date: day itself if it was a trading day, the previous trading day otherwise
+
+    """
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def is_session_open(now: datetime) -> bool:
+    """Check if GPW session is running.
+
+    Args:
+        now (datetime): moment to check, in Warsaw time
+
+    Returns:
+        bool
+
+    """
+    return is_trading_day(now.date()) and SESSION_OPEN <= now.time() <= SESSION_CLOSE
+
+
+def plan_posts(day: date, rng: np.random.Generator | None = None) -> list[str]:
+    """Decide which heatmaps are due.
+
+    Args:
+        day (date): date of the run
+        rng (np.random.Generator | None, optional): source of the random YTD posts. Defaults to None (fresh one).
+
+    Returns:
+        list[str]: periods to post, in order of posting
+
+    """
+    today = pd.Timestamp(day)
+    plan = []
+
+    # post daily heatmap
+    if is_trading_day(today.date()):
+        plan.append("1D")
+    else:
+        logger.info("today was not a trading day")
+
+    saturday_in_week = 5
+    # on saturday post 1w performance
+    if today.weekday() == saturday_in_week:
+        plan.append("1W")
+    else:
+        logger.info("not posting weekly heatmap")
+
+    # on last day of the month post 1m performance
+    if today.is_month_end:
+        plan.append("MTD")
+    else:
+        logger.info("not posting monthly heatmap")
+
+    # on last day of the quarter post 1q performance
+    if today.is_quarter_end:
+        plan.append("QTD")
+    else:
+        logger.info("not posting quarterly heatmap")
+
+    # on last day of the year post 1y performance
+    if today.is_year_end:
+        plan.append("YTD")
+    else:
+        logger.info("not posting yearly heatmap")
+
+    # choose randomly a day to post ytd performance
+    # 24 out of 360, so on average every 15 days
+    if rng is None:
+        rng = np.random.default_rng()
+    if rng.random() < 24 / 360:
+        plan.append("YTD")
+    else:
+        logger.info("not posting ytd heatmap")
+
+    return plan
@@ -0,0 +1,111 @@
+"""Dense panel of daily closes.
+
+Closes are scattered straight into a preallocated dates x tickers float32
+array, so no aggregation or intermediate MultiIndex frames are needed and
+the panel takes half the memory of a float64 frame.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class PricePanel:
+    """Dates x tickers array of closes with its axes.
+
+    Attributes:
+        dates (pd.DatetimeIndex): sorted sessions, rows of values
+        tickers (pd.Index): sorted tickers, columns of values
+        values (np.ndarray): float32 closes, NaN where there was no close
+
+    """
+
+    DTYPE = np.float32
+
+    def __init__(self, dates: pd.DatetimeIndex, tickers: pd.Index, values: np.ndarray) -> None:
+        if values.shape != (len(dates), len(tickers)):
+            msg = f"values of shape {values.shape} do not match {len(dates)} dates and {len(tickers)} tickers"
+            raise ValueError(msg)
+
+        self.dates = dates
+        self.tickers = tickers
+        self.values = values
+
+    @classmethod
+    def from_closes(cls, history: pd.DataFrame, suffix: str = ".WA") -> "PricePanel":
+        """Build panel from long closes.
+
+        If a (date, symbol) pair repeats, the last close is kept.
+
+        Args:
+            history (pd.DataFrame): cols('date', 'symbol', 'close')
+            suffix (str, optional): removed from symbols to get tickers. Defaults to ".WA".
+
+        Returns:
+            PricePanel: panel with gaps left as NaN
+
+        """
+        # factorizing before conversion converts only unique dates
+        date_codes, dates = pd.factorize(history["date"], sort=True)
+        symbol_codes, symbols = pd.factorize(history["symbol"], sort=True)
+
+        values = np.full((len(dates), len(symbols)), np.nan, dtype=cls.DTYPE)
+        values[date_codes, symbol_codes] = history["close"].to_numpy(dtype=cls.DTYPE)
+
+        tickers = pd.Index([symbol.removesuffix(suffix) for symbol in symbols])
+        return cls(pd.DatetimeIndex(pd.to_datetime(dates), name="date"), tickers, values)
+
+    def drop_empty(self) -> "PricePanel":
+        """Drop tickers and sessions without any close.
+
+        A ticker with no close would stay NaN after filling and end up on
+        heatmaps with NaN returns, so it is dropped like pivot tables do.
+
+        Returns:
+            PricePanel: self
+
+        """
+        has_close = ~np.isnan(self.values)
+        rows = has_close.any(axis=1)
+        columns = has_close.any(axis=0)
+        if rows.all() and columns.all():
+            return self
+
+        self.dates = self.dates[rows]
+        self.tickers = self.tickers[columns]
+        self.values = self.values[np.ix_(rows, columns)]
+        return self
+
+    def fill(self) -> "PricePanel":
+        """Fill gaps in place.
+
+        Forward fills sessions without a close, then fills sessions before the
+        first close of every ticker with that first close. This provides an
+        anchor value to calculate longer periods for newly listed tickers.
+
+        Returns:
+            PricePanel: self
+
+        """
+        values = self.values
+        has_close = ~np.isnan(values)
+
+        # row of the last close up to every session, 0 before the first one
+        last_close = np.where(has_close, np.arange(len(values))[:, None], 0)
+        np.maximum.accumulate(last_close, axis=0, out=last_close)
+        values[:] = np.take_along_axis(values, last_close, axis=0)
+
+        # after forward fill only sessions before the first close are missing
+        first_close = has_close.argmax(axis=0)
+        before_first = np.arange(len(values))[:, None] < first_close
+        np.copyto(values, values[first_close, np.arange(values.shape[1])], where=before_first)
+
+        return self
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get prices frame backed by the panel's array, without a copy.
+
+        Returns:
+            pd.DataFrame: prices with index of dates and columns of stock prices
+
+        """
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
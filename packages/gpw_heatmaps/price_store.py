@@ -0,0 +1,158 @@
+"""Local store of daily closes of WIG components.
+
+Closes are kept in long format (date, symbol, close) and partitioned by year,
+so every run only has to download sessions after the last stored date.
+"""
+
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+import pandas as pd
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+
+class PriceStore:
+    """Yearly partitioned parquet store of daily closes.
+
+    Attributes:
+        root (Path): directory with partitions
+        overlap (int): how many days before the last stored date are downloaded
+            again to catch revisions of the latest sessions
+
+    """
+
+    COLUMNS = ("date", "symbol", "close")
+
+    def __init__(self, root: Path = Path("data", "prices"), overlap: int = 7) -> None:
+        self.root = root
+        self.overlap = overlap
+
+    def _partition_path(self, year: int) -> Path:
+        return self.root / f"year={year}" / "closes.parquet"
+
+    def _years(self) -> list[int]:
+        if not self.root.exists():
+            return []
+        return sorted(
+            int(path.name.removeprefix("year="))
+            for path in self.root.glob("year=*")
+            if self._partition_path(int(path.name.removeprefix("year="))).exists()
+        )
+
+    def _read_partition(self, year: int) -> pd.DataFrame:
+        return pd.read_parquet(self._partition_path(year), columns=list(self.COLUMNS))
+
+    def _write_partition(self, year: int, closes: pd.DataFrame) -> None:
+        path = self._partition_path(year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write next to the target and swap, so a crash never leaves half a partition
+        tmp_path = path.with_suffix(".parquet.tmp")
+        closes.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def last_date(self) -> pd.Timestamp | None:
+        """Get the last stored session.
+
+        Returns:
+            pd.Timestamp | None: last date in the store, None if the store is empty
+
+        """
+        years = self._years()
+        if not years:
+            return None
+        return self._read_partition(years[-1])["date"].max()
+
+    def first_date(self) -> pd.Timestamp | None:
+        """Get the first stored session.
+
+        Returns:
+            pd.Timestamp | None: first date in the store, None if the store is empty
+
+        """
+        years = self._years()
+        if not years:
+            return None
+        return self._read_partition(years[0])["date"].min()
+
+    def symbols(self) -> set[str]:
+        """Get symbols present in the latest partition.
+
+        Returns:
+            set[str]: symbols with recent history in the store
+
+        """
+        years = self._years()
+        if not years:
+            return set()
+        return set(self._read_partition(years[-1])["symbol"].unique())
+
+    def fetch_start(self, default_start: pd.Timestamp) -> pd.Timestamp:
+        """Get the first date that has to be downloaded.
+
+        Args:
+            default_start (pd.Timestamp): start of the lookback window
+
+        Returns:
+            pd.Timestamp: last stored date minus overlap or default_start
+                if the store does not cover the lookback window
+
+        """
+        last_date = self.last_date()
+        if last_date is None or last_date < default_start:
+            return default_start
+        return max(default_start, last_date - pd.Timedelta(days=self.overlap))
+
+    def load(self, start: pd.Timestamp, symbols: Iterable[str] | None = None) -> pd.DataFrame:
+        """Load closes since start.
+
+        Args:
+            start (pd.Timestamp): first date to load
+            symbols (Iterable[str] | None, optional): symbols to keep. Defaults to None (all).
+
+        Returns:
+            pd.DataFrame: cols('date', 'symbol', 'close')
+
+        """
+        parts = [self._read_partition(year) for year in self._years() if year >= start.year]
+        if not parts:
+            return pd.DataFrame(columns=list(self.COLUMNS))
+
+        closes = pd.concat(parts, ignore_index=True)
+        closes = closes.loc[closes["date"] >= start]
+        if symbols is not None:
+            closes = closes.loc[closes["symbol"].isin(list(symbols))]
+        return closes.reset_index(drop=True)
+
+    def merge(self, closes: pd.DataFrame) -> None:
+        """Merge downloaded closes into the store.
+
+        Newly downloaded values replace stored ones for the same date and symbol.
+
+        Args:
+            closes (pd.DataFrame): cols('date', 'symbol', 'close')
+
+        """
+        if closes.empty:
+            return
+
+        closes = closes.loc[:, list(self.COLUMNS)]
+        years = set(self._years())
+        for year, new_closes in closes.groupby(closes["date"].dt.year):
+            if year in years:
+                new_closes = pd.concat([self._read_partition(year), new_closes], ignore_index=True)
+
+            merged = (
+                new_closes.drop_duplicates(subset=["date", "symbol"], keep="last")
+                .sort_values(["date", "symbol"])
+                .reset_index(drop=True)
+            )
+            self._write_partition(year, merged)
+
+        logger.info(
+            "merged closes into price store",
+            extra={"rows": len(closes), "first_date": closes["date"].min(), "last_date": closes["date"].max()},
+        )
@@ -0,0 +1,124 @@
+"""Content-addressed cache of rendered heatmaps.
+
+Images are stored under a hash of the heatmap data, period, time and chart
+style, so the same heatmap is never rendered twice.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from heatmap import style_params, timestamp_text
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+
+class RenderCache:
+    """Size bounded directory of rendered heatmaps.
+
+    Attributes:
+        root (Path): directory with cached images
+        max_bytes (int): size of the cache above which the least recently used images are removed
+
+    """
+
+    def __init__(self, root: Path = Path("cache", "heatmaps"), max_bytes: int = 500 * 1024**2) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(data: pd.DataFrame, period: str, now: datetime) -> str:
+        """Hash everything that ends up on the heatmap.
+
+        The time of the chart is shown to the minute, so it is part of the key.
+        Posted charts are stamped with the session close rather than the time of
+        rendering, so the same data rendered again on the same day is a hit.
+
+        Args:
+            data (pd.DataFrame): data prepared for the heatmap
+            period (str): period of returns
+            now (datetime): time of the chart
+
+        Returns:
+            str: hex digest identifying the image
+
+        """
+        digest = hashlib.sha256()
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+        digest.update(json.dumps(list(map(str, data.columns))).encode())
+        digest.update(
+            json.dumps(
+                {"period": period, "timestamp": timestamp_text(now), "style": style_params()},
+                sort_keys=True,
+            ).encode(),
+        )
+        return digest.hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}.png"
+
+    def staging_path_for(self, key: str) -> Path:
+        """Get path to render into before the image is added to the cache.
+
+        Returns:
+            Path: path with the same extension as the final image
+
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f"{key}.tmp.png"
+
+    def get(self, key: str) -> Path | None:
+        """Get cached image.
+
+        Args:
+            key (str): key from make_key
+
+        Returns:
+            Path | None: path to image, None if it is not cached
+
+        """
+        path = self.path_for(key)
+        if not path.exists():
+            return None
+
+        # mark as recently used for eviction
+        path.touch()
+        logger.info("render cache hit", extra={"key": key})
+        return path
+
+    def commit(self, key: str) -> Path:
+        """Move rendered image from staging path into the cache.
+
+        Args:
+            key (str): key from make_key
+
+        Returns:
+            Path: path to cached image
+
+        """
+        path = self.path_for(key)
+        os.replace(self.staging_path_for(key), path)
+        return path
+
+    def evict(self) -> None:
+        """Remove least recently used images until cache fits in max_bytes."""
+        if not self.root.exists():
+            return
+
+        images = sorted(self.root.glob("*.png"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in images)
+
+        removed = 0
+        for path in images:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink()
+            removed += 1
+
+        if removed:
+            logger.info("evicted images from render cache", extra={"removed": removed, "bytes": total})
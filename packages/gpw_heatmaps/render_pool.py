@@ -0,0 +1,145 @@
+"""Rendering heatmaps in a pool of worker processes.
+
+Rendering is CPU heavy and runs in kaleido/Chromium, so running it in
+separate processes spreads it over cores and a hung worker can be killed
+without stalling the whole run.
+"""
+
+import multiprocessing as mp
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from multiprocessing.util import Finalize
+
+import pandas as pd
+from heatmap import make_heatmap_figure
+from mylogging import setup
+from renderer import HeatmapRenderer
+
+logger = setup(__name__, __file__)
+
+# warm renderer of the worker process, created by _init_worker
+_worker_renderer: HeatmapRenderer | None = None
+
+
+@dataclass(frozen=True)
+class RenderJob:
+    """Single heatmap to render.
+
+    Attributes:
+        data (pd.DataFrame): data prepared for the heatmap
+        path (str): filename with extension
+        period (str): period of returns
+        now (datetime): date of the chart, tz-aware
+
+    """
+
+    data: pd.DataFrame
+    path: str
+    period: str
+    now: datetime
+
+
+def _render_job(job: RenderJob, renderer: HeatmapRenderer) -> float:
+    start = time.perf_counter()
+    renderer.write(make_heatmap_figure(job.data, job.period, job.now), job.path)
+    return time.perf_counter() - start
+
+
+def _init_worker() -> None:
+    global _worker_renderer  # noqa: PLW0603
+    _worker_renderer = HeatmapRenderer()
+    # pool workers skip atexit, finalizers are run on a clean worker exit
+    Finalize(_worker_renderer, _worker_renderer.close, exitpriority=10)
+
+
+def _render_in_worker(job: RenderJob) -> float:
+    if _worker_renderer is None:
+        msg = "worker renderer was not initialized"
+        raise RuntimeError(msg)
+    return _render_job(job, _worker_renderer)
+
+
+def render_heatmaps(
+    jobs: list[RenderJob],
+    max_workers: int = 3,
+    timeout: float = 300,
+    renderer: HeatmapRenderer | None = None,
+) -> list[bool]:
+    """Render heatmaps in parallel.
+
+    Every job is a separate task with its own timeout, so a failed or hung
+    figure skips only its own post. Every worker exports its jobs through its
+    own warm renderer. Workers are spawned fresh for every call; if any job
+    times out, all workers are terminated at the end.
+
+    With max_workers set to 0 all jobs are exported in this process through
+    renderer, one by one, without timeouts.
+
+    Args:
+        jobs (list[RenderJob]): heatmaps to render
+        max_workers (int, optional): number of worker processes. Defaults to 3.
+        timeout (float, optional): seconds to wait for a single job. Defaults to 300.
+        renderer (HeatmapRenderer | None, optional): renderer for in-process rendering.
+            Defaults to None.
+
+    Raises:
+        ValueError: If max_workers is 0 and no renderer is passed.
+
+    Returns:
+        list[bool]: whether each job was rendered, in order of jobs
+
+    """
+    if not jobs:
+        return []
+
+    if max_workers == 0:
+        if renderer is None:
+            msg = "renderer is required for in-process rendering"
+            raise ValueError(msg)
+        rendered = []
+        for job in jobs:
+            try:
+                elapsed = _render_job(job, renderer)
+            except Exception:
+                logger.exception("rendering heatmap failed", extra={"path": job.path})
+                rendered.append(False)
+            else:
+                logger.info("rendered heatmap", extra={"path": job.path, "seconds": round(elapsed, 2)})
+                rendered.append(True)
+        return rendered
+
+    processes = max(1, min(max_workers, len(jobs)))
+    logger.info("rendering heatmaps", extra={"number_of_jobs": len(jobs), "processes": processes})
+
+    rendered = []
+    timed_out = False
+
+    ctx = mp.get_context("spawn")
+    pool = ctx.Pool(processes=processes, initializer=_init_worker)
+    try:
+        results = [pool.apply_async(_render_in_worker, (job,)) for job in jobs]
+
+        for job, result in zip(jobs, results, strict=True):
+            try:
+                elapsed = result.get(timeout=timeout)
+            except mp.TimeoutError:
+                logger.error("rendering heatmap timed out", extra={"path": job.path, "timeout": timeout})  # noqa: TRY400
+                timed_out = True
+                rendered.append(False)
+            except Exception:
+                logger.exception("rendering heatmap failed", extra={"path": job.path})
+                rendered.append(False)
+            else:
+                logger.info("rendered heatmap", extra={"path": job.path, "seconds": round(elapsed, 2)})
+                rendered.append(True)
+    finally:
+        if timed_out:
+            # kill workers that are still stuck on timed out jobs
+            pool.terminate()
+        else:
+            # let workers stop their renderers
+            pool.close()
+        pool.join()
+
+    return rendered
@@ -0,0 +1,119 @@
+"""Warm kaleido session for exporting plotly figures.
+
+Every `fig.write_image` call starts and stops its own browser.
+HeatmapRenderer starts kaleido once and exports all figures through it.
+"""
+
+import atexit
+import time
+from collections.abc import Sequence
+
+import kaleido
+import plotly.io as pio
+from mylogging import setup
+from plotly.graph_objects import Figure
+
+logger = setup(__name__, __file__)
+
+
+class HeatmapRenderer:
+    """Long lived kaleido session.
+
+    Kaleido keeps a single sync server per process, so there should be
+    only one running renderer per process.
+
+    Attributes:
+        tabs (int): number of browser tabs exporting figures in parallel
+        is_running (bool): whether kaleido is started
+        startup_seconds (float): total time spent starting kaleido
+        images_written (int): number of exported images
+
+    """
+
+    def __init__(self, tabs: int = 1) -> None:
+        self.tabs = tabs
+        self.is_running = False
+        self.startup_seconds = 0.0
+        self.images_written = 0
+        self._atexit_registered = False
+
+    def start(self) -> None:
+        """Start kaleido if it is not running yet."""
+        if self.is_running:
+            return
+
+        start = time.perf_counter()
+        kaleido.start_sync_server(n=self.tabs, silence_warnings=True)
+        elapsed = time.perf_counter() - start
+
+        self.startup_seconds += elapsed
+        self.is_running = True
+
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+        logger.info("started kaleido renderer", extra={"startup_seconds": round(elapsed, 2), "tabs": self.tabs})
+
+    def write(self, fig: Figure, path: str) -> None:
+        """Export single figure.
+
+        Args:
+            fig (Figure): figure to export
+            path (str): filename with extension
+
+        """
+        self.write_many([fig], [path])
+
+    def write_many(self, figs: Sequence[Figure], paths: Sequence[str]) -> None:
+        """Export many figures in one call.
+
+        Args:
+            figs (Sequence[Figure]): figures to export
+            paths (Sequence[str]): filenames with extension, one for every figure
+
+        """
+        if not figs:
+            return
+
+        self.start()
+
+        start = time.perf_counter()
+        # write_images does not fall back to layout size like write_image does
+        pio.write_images(
+            list(figs),
+            list(paths),
+            width=[fig.layout.width for fig in figs],
+            height=[fig.layout.height for fig in figs],
+        )
+        elapsed = time.perf_counter() - start
+        self.images_written += len(figs)
+
+        logger.info(
+            "exported images",
+            extra={
+                "number_of_images": len(figs),
+                "seconds": round(elapsed, 2),
+                "startup_seconds_per_image": round(self.startup_seconds / self.images_written, 2),
+            },
+        )
+
+    def close(self) -> None:
+        """Stop kaleido if it is running."""
+        if not self.is_running:
+            return
+
+        kaleido.stop_sync_server(silence_warnings=True)
+        self.is_running = False
+
+        logger.info(
+            "stopped kaleido renderer",
+            extra={"images_written": self.images_written, "startup_seconds": round(self.startup_seconds, 2)},
+        )
+
+    def __enter__(self) -> "HeatmapRenderer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,171 @@
+"""Stable layout of heatmap treemaps.
+
+Tiles of a treemap depend only on the hierarchy, the order and the sizes of
+the nodes. Those are frozen once per composition of an index (tickers,
+sectors and share counts) and kept on disk, so every heatmap of the same
+composition reuses them, only colours and labels change, and tiles stay in
+the same place from one day's chart to the next.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+
+@dataclass(frozen=True)
+class TreemapLayout:
+    """Nodes of the treemap in order of drawing.
+
+    Nodes are the root, then sectors, then tickers. Sizes are market caps
+    from the day the layout was built.
+
+    Attributes:
+        ids (list[str]): unique ids of nodes
+        labels (list[str]): labels of nodes
+        parents (list[str]): ids of parents, "" for the root
+        values (list[float]): sizes of nodes, parents sum their children
+        sectors (list[str]): sectors in order of nodes
+        tickers (list[str]): tickers in order of nodes
+
+    """
+
+    ids: list[str]
+    labels: list[str]
+    parents: list[str]
+    values: list[float]
+    sectors: list[str]
+    tickers: list[str]
+
+    @staticmethod
+    def make_key(data: pd.DataFrame) -> str:
+        """Identify composition of the index.
+
+        Args:
+            data (pd.DataFrame): data prepared for the heatmap
+
+        Returns:
+            str: sha256 of universe, tickers, sectors and share counts
+
+        """
+        composition = data[["universe", "sector", "ticker", "shares_num"]].sort_values("ticker")
+        return hashlib.sha256(composition.to_json(orient="values").encode()).hexdigest()
+
+    @classmethod
+    def from_data(cls, data: pd.DataFrame) -> "TreemapLayout":
+        """Build layout, biggest sectors and tickers first.
+
+        Args:
+            data (pd.DataFrame): data prepared for the heatmap
+
+        Returns:
+            TreemapLayout: layout of the treemap
+
+        """
+        root = str(data.universe.iloc[0])
+        sector_caps = data.groupby("sector")["mkt_cap"].sum().sort_values(ascending=False)
+        leaves = (
+            data.assign(sector_cap=data.sector.map(sector_caps))
+            .sort_values(["sector_cap", "sector", "mkt_cap"], ascending=False)
+            .reset_index(drop=True)
+        )
+
+        sectors = sector_caps.index.astype(str).to_list()
+        leaf_parents = [f"{root}/{sector}" for sector in leaves.sector]
+        leaf_ids = [f"{parent}/{ticker}" for parent, ticker in zip(leaf_parents, leaves.ticker, strict=True)]
+        return cls(
+            ids=[root, *(f"{root}/{sector}" for sector in sectors), *leaf_ids],
+            labels=[root, *sectors, *leaves.ticker],
+            parents=["", *([root] * len(sectors)), *leaf_parents],
+            values=[float(sector_caps.sum()), *sector_caps.astype(float), *leaves.mkt_cap.astype(float)],
+            sectors=sectors,
+            tickers=leaves.ticker.to_list(),
+        )
+
+    @property
+    def n_parents(self) -> int:
+        """Number of the root and sector nodes, which come before tickers."""
+        return len(self.sectors) + 1
+
+    def node_data(self, data: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """Get colours and custom data of all nodes.
+
+        Parents are coloured with market cap weighted returns of their children.
+
+        Args:
+            data (pd.DataFrame): data prepared for the heatmap
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: returns of nodes and rows of
+                (returns, company, ticker, curr_prices, sector) of nodes
+
+        """
+        leaves = data.set_index("ticker").reindex(self.tickers)
+        returns = leaves.returns.to_numpy(dtype=float)
+        mkt_cap = np.nan_to_num(leaves.mkt_cap.to_numpy(dtype=float))
+
+        sector_codes = pd.Index(self.sectors).get_indexer(leaves.sector)
+        known = sector_codes >= 0
+        contribution = np.nan_to_num(returns) * mkt_cap
+        sector_contribution = np.bincount(sector_codes[known], contribution[known], len(self.sectors))
+        sector_mkt_cap = np.bincount(sector_codes[known], mkt_cap[known], len(self.sectors))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sector_returns = sector_contribution / sector_mkt_cap
+            root_return = contribution.sum() / mkt_cap.sum()
+
+        colors = np.concatenate([[root_return], sector_returns, returns])
+
+        # parents show only their labels, the rest of their custom data is a filler
+        customdata = np.empty((len(self.ids), 5), dtype=object)
+        customdata[:, 0] = colors
+        customdata[: self.n_parents, 1:] = np.array(self.labels[: self.n_parents], dtype=object)[:, None]
+        customdata[self.n_parents :, 1] = leaves.company.to_numpy(dtype=object)
+        customdata[self.n_parents :, 2] = self.tickers
+        customdata[self.n_parents :, 3] = leaves.curr_prices.to_numpy(dtype=object)
+        customdata[self.n_parents :, 4] = leaves.sector.to_numpy(dtype=object)
+
+        return colors, customdata
+
+
+def get_layout(data: pd.DataFrame, root: Path = Path("cache", "layouts")) -> TreemapLayout:
+    """Get layout of the index composition, building and saving it the first time.
+
+    Args:
+        data (pd.DataFrame): data prepared for the heatmap
+        root (Path, optional): directory with saved layouts. Defaults to Path("cache", "layouts").
+
+    Returns:
+        TreemapLayout: layout of the treemap
+
+    """
+    path = root / f"{TreemapLayout.make_key(data)}.json"
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            return TreemapLayout(**json.load(f))
+
+    layout = TreemapLayout.from_data(data)
+    logger.info("built treemap layout", extra={"universe": layout.labels[0], "path": str(path)})
+
+    # render workers can build the same layout at once, each writes its own
+    # temporary file and the last replace wins with an identical layout
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w",
+        encoding="utf-8",
+        dir=path.parent,
+        prefix=f"{path.stem}.",
+        suffix=".json.tmp",
+        delete=False,
+    ) as f:
+        json.dump(asdict(layout), f)
+    os.replace(f.name, path)
+
+    return layout
@@ -0,0 +1,102 @@
+"""Index universes defined over WIG components.
+
+Every universe is a subset of WIG, so a single price panel and component
+registry serve heatmaps of all of them.
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Universe:
+    """Subset of WIG components.
+
+    Members are chosen by explicit tickers, by sectors or by rank of market
+    capitalization within WIG. With no rule set, the universe is all of WIG.
+
+    Attributes:
+        name (str): name of the index, used in titles
+        hashtags (str): hashtags put at the end of the tweet
+        tickers (tuple[str, ...] | None): members by ticker
+        sectors (tuple[str, ...] | None): members by sector
+        rank (tuple[int, int] | None): members by market cap rank, [start, stop)
+
+    """
+
+    name: str
+    hashtags: str = "#GPW #giełda #inwestycje #akcje"
+    tickers: tuple[str, ...] | None = None
+    sectors: tuple[str, ...] | None = None
+    rank: tuple[int, int] | None = None
+
+    def mask(self, components: pd.DataFrame, mkt_cap: np.ndarray) -> np.ndarray:
+        """Find members of the universe.
+
+        Args:
+            components (pd.DataFrame): WIG components with 'ticker' and 'sector' columns
+            mkt_cap (np.ndarray): market cap of components, in the same order
+
+        Returns:
+            np.ndarray: boolean mask over components
+
+        """
+        mask = np.ones(len(components), dtype=bool)
+        if self.tickers is not None:
+            mask &= components.ticker.isin(self.tickers).to_numpy()
+        if self.sectors is not None:
+            mask &= components.sector.isin(self.sectors).to_numpy()
+        if self.rank is not None:
+            # rank 0 is the biggest company, missing market caps go last
+            ranks = np.empty(len(mkt_cap), dtype=np.intp)
+            ranks[np.argsort(-np.nan_to_num(mkt_cap, nan=-np.inf), kind="stable")] = np.arange(len(mkt_cap))
+            start, stop = self.rank
+            mask &= (ranks >= start) & (ranks < stop)
+        return mask
+
+
+def load_universes(path: Path = Path("data", "universes.json")) -> dict[str, Universe]:
+    """Load universes definitions.
+
+    Args:
+        path (Path, optional): json with universes. Defaults to Path("data", "universes.json").
+
+    Returns:
+        dict[str, Universe]: name -> universe
+
+    """
+    with path.open(encoding="utf-8") as f:
+        definitions = json.load(f)
+
+    return {
+        name: Universe(
+            name=name,
+            hashtags=definition.get("hashtags", Universe.hashtags),
+            tickers=tuple(definition["tickers"]) if "tickers" in definition else None,
+            sectors=tuple(definition["sectors"]) if "sectors" in definition else None,
+            rank=tuple(definition["rank"]) if "rank" in definition else None,
+        )
+        for name, definition in definitions.items()
+    }
+
+
+def universe_returns(masks: np.ndarray, mkt_cap: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """Calculate market cap weighted returns of many universes for many periods at once.
+
+    Args:
+        masks (np.ndarray): universes x tickers membership
+        mkt_cap (np.ndarray): market cap of tickers
+        returns (np.ndarray): tickers x periods returns
+
+    Returns:
+        np.ndarray: universes x periods returns
+
+    """
+    weights = masks * np.nan_to_num(mkt_cap)
+    has_return = ~np.isnan(returns)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (weights @ np.where(has_return, returns, 0)) / (weights @ has_return)
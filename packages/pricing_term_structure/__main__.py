@@ -1,6 +1,7 @@
 import argparse
 from datetime import datetime
 
+from bond_store import BondPriceStore
 from bot import TermStructureBot
 from mylogging import setup
 
@@ -18,18 +19,45 @@ def parse_args() -> argparse.Namespace:
         help="Force the action (skip confirmations)",
     )
 
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="processes calculating nss curves of new dates",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        default=False,
+        help="merge parts of stored bond prices into one file per month and exit",
+    )
+    parser.add_argument(
+        "--refit-nss",
+        action="store_true",
+        default=False,
+        help="fit nss params of all stored dates again, e.g. after a change of the fit, and exit",
+    )
+
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    if args.force:
+    if args.compact:
+        logger.info("compacting bond prices store")
+        BondPriceStore().compact()
+    elif args.refit_nss:
+        logger.info("refitting nss params of all dates")
+        bot = TermStructureBot(workers=args.workers)
+        bot.update_nss_curve(refit=True)
+    elif args.force:
         logger.info("forced to post, running pricing term structure project")
-        bot = TermStructureBot()
+        bot = TermStructureBot(workers=args.workers)
         bot.run()
     elif datetime.today().day == 1:
         logger.info("it's first of the month, running pricing term structure project")
-        bot = TermStructureBot()
+        bot = TermStructureBot(workers=args.workers)
         bot.run()
     else:
         logger.info("skipping pricing term structure project")
@@ -0,0 +1,179 @@
+"""Partitioned store of bond prices from bondspot.
+
+Prices are kept in a parquet dataset partitioned by year and month. Every
+update appends new part files atomically instead of rewriting the whole
+history, reads of a date range open only the partitions they need and
+compaction merges the parts of a month into one file.
+"""
+
+import os
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.dataset as ds
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+
+class BondPriceStore:
+    """Year/month partitioned parquet dataset of bond prices.
+
+    Attributes:
+        root (Path): directory with partitions
+        legacy_path (Path): single file store migrated on first use
+
+    """
+
+    KEY = ("Date", "Seria", "Kod ISIN", "Fixing")
+
+    def __init__(
+        self,
+        root: Path = Path("data", "bond_prices"),
+        legacy_path: Path = Path("data", "bond_prices.parquet"),
+    ) -> None:
+        self.root = root
+        self.legacy_path = legacy_path
+
+    def _partition_dir(self, year: int, month: int) -> Path:
+        return self.root / f"year={year}" / f"month={month}"
+
+    def _parts(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return sorted(self.root.glob("year=*/month=*/*.parquet"))
+
+    def _months(self) -> list[tuple[int, int]]:
+        return sorted({self._month_of(part) for part in self._parts()})
+
+    def _write_part(self, year: int, month: int, prices: pd.DataFrame) -> Path:
+        directory = self._partition_dir(year, month)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        # parts are named by time of writing, so later parts win on duplicates
+        path = directory / f"part-{time.time_ns()}.parquet"
+        tmp_path = path.with_suffix(".parquet.tmp")
+        prices.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def migrate(self) -> None:
+        """Partition the legacy single file store, if the dataset does not exist yet.
+
+        The legacy file is left in place.
+        """
+        if self._parts() or not self.legacy_path.exists():
+            return
+
+        prices = pd.read_parquet(self.legacy_path)
+        self.append(prices)
+        logger.info("migrated bond prices to partitioned store", extra={"rows": len(prices), "root": str(self.root)})
+
+    def append(self, prices: pd.DataFrame) -> None:
+        """Append prices as new parts of their months.
+
+        Args:
+            prices (pd.DataFrame): prices with a 'Date' column
+
+        """
+        if prices.empty:
+            return
+
+        for (year, month), month_prices in prices.groupby([prices.Date.dt.year, prices.Date.dt.month]):
+            self._write_part(year, month, month_prices.reset_index(drop=True))
+
+        logger.info(
+            "appended bond prices",
+            extra={"rows": len(prices), "first_date": prices.Date.min(), "last_date": prices.Date.max()},
+        )
+
+    def read(
+        self,
+        start: pd.Timestamp | None = None,
+        end: pd.Timestamp | None = None,
+        columns: Sequence[str] | None = None,
+    ) -> pd.DataFrame:
+        """Read prices from a date range, opening only partitions of its months.
+
+        If the same price was appended more than once, the latest one is kept.
+
+        Args:
+            start (pd.Timestamp | None, optional): first date. Defaults to None (from the beginning).
+            end (pd.Timestamp | None, optional): last date. Defaults to None (to the end).
+            columns (Sequence[str] | None, optional): columns to read. Defaults to None (all).
+
+        Returns:
+            pd.DataFrame: prices sorted by date
+
+        """
+        parts = [
+            str(part)
+            for part in self._parts()
+            if (start is None or self._month_of(part) >= (start.year, start.month))
+            and (end is None or self._month_of(part) <= (end.year, end.month))
+        ]
+        if not parts:
+            return pd.DataFrame(columns=list(columns) if columns is not None else list(self.KEY))
+
+        dataset = ds.dataset(parts, format="parquet")
+        filters = []
+        if start is not None:
+            filters.append(ds.field("Date") >= pd.Timestamp(start))
+        if end is not None:
+            filters.append(ds.field("Date") <= pd.Timestamp(end))
+        expression = None
+        for condition in filters:
+            expression = condition if expression is None else expression & condition
+
+        read_columns = None if columns is None else list(dict.fromkeys([*columns, *self.KEY]))
+        prices = dataset.to_table(columns=read_columns, filter=expression).to_pandas()
+
+        prices = prices.drop_duplicates(subset=list(self.KEY), keep="last").sort_values("Date", kind="stable")
+        if columns is not None:
+            prices = prices.loc[:, list(columns)]
+        return prices.reset_index(drop=True)
+
+    @staticmethod
+    def _month_of(part: Path) -> tuple[int, int]:
+        return int(part.parent.parent.name.removeprefix("year=")), int(part.parent.name.removeprefix("month="))
+
+    def last_date(self) -> pd.Timestamp | None:
+        """Get the last stored date, reading only the latest month.
+
+        Returns:
+            pd.Timestamp | None: last date, None if the store is empty
+
+        """
+        months = self._months()
+        if not months:
+            return None
+        year, month = months[-1]
+        last_month = self.read(start=pd.Timestamp(year, month, 1), columns=["Date"])
+        return last_month.Date.max()
+
+    def compact(self) -> int:
+        """Merge parts of every month into a single part.
+
+        Returns:
+            int: number of compacted months
+
+        """
+        compacted = 0
+        for year, month in self._months():
+            parts = sorted(self._partition_dir(year, month).glob("*.parquet"))
+            if len(parts) < 2:
+                continue
+
+            month_start = pd.Timestamp(year, month, 1)
+            prices = self.read(start=month_start, end=month_start + pd.offsets.MonthEnd(0))
+            # the merged part is written before old ones are removed,
+            # a crash in between leaves duplicates, which reads drop
+            self._write_part(year, month, prices)
+            for part in parts:
+                part.unlink()
+            compacted += 1
+
+        logger.info("compacted bond prices", extra={"months": compacted})
+        return compacted
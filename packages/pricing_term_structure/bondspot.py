@@ -0,0 +1,321 @@
+"""Fetching fixing pages from bondspot.
+
+Every page with fixings is kept on disk as soon as it is parsed, until its
+prices are stored, so a failed catch-up run resumes where it stopped instead
+of starting over. Pages are handed out as they arrive, so they can be parsed
+while others are downloaded.
+"""
+
+import asyncio
+import os
+import traceback
+from collections.abc import AsyncIterator, Iterable
+from datetime import datetime
+from io import StringIO
+from itertools import product
+from pathlib import Path
+
+import httpx
+import lxml.html
+import pandas as pd
+import QuantLib as ql
+from aiolimiter import AsyncLimiter
+from mylogging import setup
+from twitter_bot_base import Replay, get_replay
+
+logger = setup(__name__, __file__)
+
+# WSE calendar misses Good Friday, when there are no fixings either;
+# all other TARGET holidays are Polish holidays anyway
+SESSION_CALENDAR = ql.JointCalendar(ql.Poland(ql.Poland.WSE), ql.TARGET())
+
+
+def session_dates(start_date: str | datetime, end_date: str | datetime) -> list[str]:
+    """Get dates with a bondspot session.
+
+    Args:
+        start_date (str | datetime): first date
+        end_date (str | datetime): last date
+
+    Returns:
+        list[str]: dates as YYYYMMDD
+
+    """
+    return [
+        date.strftime("%Y%m%d")
+        for date in pd.date_range(start_date, end_date, freq="B")
+        if SESSION_CALENDAR.isBusinessDay(ql.Date(date.day, date.month, date.year))
+    ]
+
+
+def available_fixings(bond_prices: pd.DataFrame, sessions: int = 20) -> tuple[int, ...]:
+    """Find fixings bondspot currently publishes.
+
+    Args:
+        bond_prices (pd.DataFrame): stored prices with 'Date' and 'Fixing' columns
+        sessions (int, optional): how many last stored sessions to look at. Defaults to 20.
+
+    Returns:
+        tuple[int, ...]: numbers of fixings, all known fixings if nothing is stored
+
+    """
+    recent_dates = bond_prices.Date.drop_duplicates().nlargest(sessions)
+    fixings = bond_prices.loc[bond_prices.Date.isin(recent_dates), "Fixing"].dropna().unique()
+    if not len(fixings):
+        return BondspotFetcher.FIXINGS
+    return tuple(sorted(int(fixing) for fixing in fixings))
+
+
+# innermost table with an ISIN header cell, the fixing table
+FIXING_TABLE_XPATH = "//table[not(.//table)][.//*[self::th or self::td][normalize-space()='ISIN']]"
+
+
+def parse_fixing_page(html: str, date: str, fixing: int) -> tuple[pd.DataFrame | None, str | None]:
+    """Extract the fixing table from a bondspot page.
+
+    Only the fixing table is handed to pd.read_html, the rest of the page
+    is never parsed into tables. Pages are parsed in worker processes,
+    where logging does not reach the log files, so a failure is returned
+    to be logged by the caller instead of being logged here.
+
+    Args:
+        html (str): bondspot page
+        date (str): date of fixing, YYYYMMDD
+        fixing (int): number of fixing
+
+    Returns:
+        tuple[pd.DataFrame | None, str | None]: fixing table with 'date' and 'fixing' columns
+            and None, or None and the traceback if the page has no fixings
+
+    """
+    try:
+        tables = lxml.html.fromstring(html).xpath(FIXING_TABLE_XPATH)
+        if not tables:
+            msg = "no fixing table on the page"
+            raise ValueError(msg)
+        df = pd.read_html(StringIO(lxml.html.tostring(tables[0], encoding="unicode")))[0]
+    except Exception:
+        return None, traceback.format_exc()
+
+    df["date"] = date
+    df["fixing"] = str(fixing)
+    return df, None
+
+
+class RawResponseCache:
+    """Raw bondspot pages keyed by (date, fixing).
+
+    Attributes:
+        root (Path): directory with pages
+
+    """
+
+    def __init__(self, root: Path = Path("data", "bondspot_raw")) -> None:
+        self.root = root
+
+    def path_for(self, date: str, fixing: int) -> Path:
+        return self.root / f"{date}_{fixing}.html"
+
+    def get(self, date: str, fixing: int) -> str | None:
+        """Get cached page.
+
+        Args:
+            date (str): date of fixing, YYYYMMDD
+            fixing (int): number of fixing
+
+        Returns:
+            str | None: html, None if the page was not downloaded yet
+
+        """
+        path = self.path_for(date, fixing)
+        if not path.exists():
+            return None
+        return path.read_text(encoding="utf-8")
+
+    def put(self, date: str, fixing: int, html: str) -> None:
+        """Save page, replacing it atomically.
+
+        Args:
+            date (str): date of fixing, YYYYMMDD
+            fixing (int): number of fixing
+            html (str): page
+
+        """
+        path = self.path_for(date, fixing)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".html.tmp")
+        tmp_path.write_text(html, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def discard(self, date: str, fixing: int) -> None:
+        """Remove page, if it is cached.
+
+        Args:
+            date (str): date of fixing, YYYYMMDD
+            fixing (int): number of fixing
+
+        """
+        self.path_for(date, fixing).unlink(missing_ok=True)
+
+    def prune(self, last_date: str) -> int:
+        """Remove pages of dates up to last_date, e.g. the ones with stored prices.
+
+        Args:
+            last_date (str): last date to remove, YYYYMMDD
+
+        Returns:
+            int: number of removed pages
+
+        """
+        if not self.root.exists():
+            return 0
+
+        pruned = 0
+        for path in self.root.glob("*.html"):
+            if path.stem.split("_")[0] <= last_date:
+                path.unlink(missing_ok=True)
+                pruned += 1
+
+        if pruned:
+            logger.info("pruned cached bondspot pages", extra={"pages": pruned, "last_date": last_date})
+        return pruned
+
+
+class BondspotFetcher:
+    """Downloads fixing pages concurrently, with retries and a raw page cache.
+
+    A failed request is retried with exponential backoff and never cancels
+    the others. Pages of past dates are cached once they are parsed with
+    keep, pages of today are not, because today's fixings may not be
+    published yet.
+
+    Attributes:
+        headers (dict): headers sent with every request
+        cache (RawResponseCache): downloaded pages
+        max_rate (int): requests per second
+        max_tries (int): how many times to try every request
+        backoff (float): seconds to wait after the first failed try, doubled after every next one
+        replay (Replay): record and replay of requests
+
+    """
+
+    LINK = "https://www.bondspot.pl/fixing_obligacji"
+    FIXINGS = (1, 2)
+
+    def __init__(
+        self,
+        headers: dict,
+        cache: RawResponseCache | None = None,
+        max_rate: int = 5,
+        max_tries: int = 5,
+        backoff: float = 2.0,
+    ) -> None:
+        self.headers = headers
+        self.cache = RawResponseCache() if cache is None else cache
+        self.max_rate = max_rate
+        self.max_tries = max_tries
+        self.backoff = backoff
+        self.replay: Replay = get_replay()
+
+    async def _fetch_one(
+        self,
+        client: httpx.AsyncClient,
+        date: str,
+        fixing: int,
+        limiter: AsyncLimiter,
+    ) -> str | None:
+        params = {"date": date, "type": fixing}
+        for tries in range(self.max_tries):
+            try:
+                async with limiter:
+                    logger.info("making request to bondspot", extra=params)
+                    response = await self.replay.acall(
+                        f"bondspot_{date}_{fixing}",
+                        client.get,
+                        self.LINK,
+                        params=params,
+                        headers=self.headers,
+                    )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                delay = self.backoff * 2**tries
+                logger.warning(
+                    "request to bondspot failed",
+                    extra={**params, "try": tries + 1, "retry_in_seconds": delay},
+                )
+                if tries + 1 < self.max_tries:
+                    await asyncio.sleep(delay)
+            else:
+                return response.text
+
+        logger.error("giving up on bondspot request", extra=params)
+        return None
+
+    def keep(self, date: str, fixing: int, html: str) -> None:
+        """Cache a page that turned out to have fixings.
+
+        Pages of today and pages already cached are not written.
+
+        Args:
+            date (str): date of fixing, YYYYMMDD
+            fixing (int): number of fixing
+            html (str): page
+
+        """
+        if date >= datetime.today().strftime("%Y%m%d") or self.cache.path_for(date, fixing).exists():
+            return
+        self.cache.put(date, fixing, html)
+
+    async def stream(
+        self,
+        dates: Iterable[str],
+        fixings: Iterable[int] | None = None,
+    ) -> AsyncIterator[tuple[tuple[str, int], str]]:
+        """Get fixing pages of dates as they arrive, downloading only the ones not cached.
+
+        Cached pages come first, downloaded ones in order of arrival. Pages
+        that failed to download are left out.
+
+        Args:
+            dates (Iterable[str]): session dates, YYYYMMDD
+            fixings (Iterable[int] | None, optional): fixings to get. Defaults to None (FIXINGS).
+
+        Yields:
+            tuple[tuple[str, int], str]: (date, fixing) and html
+
+        """
+        missing = []
+        cached = 0
+        for date, fixing in product(dates, self.FIXINGS if fixings is None else tuple(fixings)):
+            html = self.cache.get(date, fixing)
+            if html is None:
+                missing.append((date, fixing))
+            else:
+                cached += 1
+                yield (date, fixing), html
+
+        logger.info("fetching bondspot pages", extra={"cached": cached, "missing": len(missing)})
+        if not missing:
+            return
+
+        async def fetch_keyed(client: httpx.AsyncClient, key: tuple[str, int]) -> tuple[tuple[str, int], str | None]:
+            return key, await self._fetch_one(client, *key, limiter)
+
+        limiter = AsyncLimiter(max_rate=self.max_rate, time_period=1)
+        failed = 0
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            tasks = [asyncio.ensure_future(fetch_keyed(client, key)) for key in missing]
+            try:
+                for next_page in asyncio.as_completed(tasks):
+                    key, html = await next_page
+                    if html is None:
+                        failed += 1
+                    else:
+                        yield key, html
+            finally:
+                # consumer stopped early
+                for task in tasks:
+                    task.cancel()
+
+        if failed:
+            logger.warning("some bondspot pages failed, run again to fetch them", extra={"failed": failed})
@@ -2,9 +2,10 @@ import asyncio
 import json
 import os
 import re
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
-from io import StringIO
 from itertools import product
 from pathlib import Path
 
@@ -12,12 +13,23 @@ import httpx
 import numpy as np
 import pandas as pd
 import QuantLib as ql
-from aiolimiter import AsyncLimiter
+from bond_store import BondPriceStore
+from bondspot import BondspotFetcher, available_fixings, parse_fixing_page, session_dates
+from interest_calendar import (
+    CALENDAR_PATH,
+    conditional_headers,
+    load_meta,
+    merge_series,
+    parse_interest_calendar,
+    save_meta,
+    validators_of,
+)
 from matplotlib import pyplot as plt
 from mylogging import setup
+from nss_fit import PARAMS, fit_many, nss
+from nss_store import MATURITIES, NSSParamsStore
 from pyacm import NominalACM
 from QuantLib import YieldTermStructureHandle
-from scipy.optimize import minimize
 from twitter_bot_base import TwitterBot
 
 logger = setup(__name__, __file__)
@@ -27,290 +39,437 @@ os.chdir(Path(__file__).parent)
 plt.style.use("dark_background")
 
 
+# maturities in months, the nss model is not defined at 0
+ZERO_RATE_PERIODS = (1, 2, 3, 6, 12, 24, 36, 60, 84, 120, 180)
+
+
+@dataclass(frozen=True)
+class ZeroRateGrid:
+    """Zero rates of many dates on one grid of maturities.
+
+    Attributes:
+        dates (pd.DatetimeIndex): dates of curves
+        periods (np.ndarray): maturities in months
+        rates (np.ndarray): dates x periods rates, NaN where they could not be calculated
+
+    """
+
+    dates: pd.DatetimeIndex
+    periods: np.ndarray
+    rates: np.ndarray
+
+    @property
+    def failed(self) -> np.ndarray:
+        """Dates x periods mask of rates that could not be calculated."""
+        return np.isnan(self.rates)
+
+
 class NSShelper:
+    # more shards than workers even out uneven dates and report progress more often
+    SHARDS_PER_WORKER = 4
+
     def __init__(self):
         self.calendar = ql.Poland()
         self.day_counter = ql.ActualActual(ql.ActualActual.ISDA)
         self.settlement_days = 2
 
+        # helpers of series quoted on the last date, by (Seria, start, coupon, maturity)
+        self._helpers: dict[tuple, tuple[ql.SimpleQuote, ql.FixedRateBondHelper]] = {}
+        self._curve = None
+        self._curve_key = None
+
+    def _make_helper(self, price, coupon, maturity, start) -> tuple[ql.SimpleQuote, ql.FixedRateBondHelper]:
+        start = ql.Date(start.day, start.month, start.year)
+        maturity = ql.Date(maturity.day, maturity.month, maturity.year)
+
+        schedule = ql.MakeSchedule(
+            start,
+            maturity,
+            ql.Period(ql.Annual),
+            calendar=self.calendar,
+            convention=ql.ModifiedFollowing,
+            terminalDateConvention=ql.ModifiedFollowing,
+            rule=ql.DateGeneration.Backward,
+            endOfMonth=False,
+        )
+
+        quote = ql.SimpleQuote(price)
+        helper = ql.FixedRateBondHelper(
+            ql.QuoteHandle(quote),
+            self.settlement_days,
+            100.0,
+            schedule,
+            [coupon],
+            self.day_counter,
+            ql.Following,
+            100.0,
+            start,
+        )
+        return quote, helper
+
     def build_zero_curve_from_bonds(
         self,
         bonds: pd.DataFrame,
         eval_date: datetime,
         curve_cls=ql.PiecewiseCubicZero,
     ) -> YieldTermStructureHandle:
+        """Build zero curve of a date, reusing helpers and the curve of the previous date.
+
+        Schedule and coupon of a series do not change within a coupon period,
+        so a helper is built once per series and period, and only its quote is
+        updated. If the same series are quoted as on the previous date, the
+        previous curve, which follows the evaluation date, is reused and
+        QuantLib bootstraps it again lazily.
+
+        Args:
+            bonds (pd.DataFrame): fix_price, Kupon, Data wykupu and Początek okresu of series
+            eval_date (datetime): date of the curve
+            curve_cls (optional): QuantLib curve. Defaults to ql.PiecewiseCubicZero.
+
+        Returns:
+            YieldTermStructureHandle: zero curve
+
+        """
         eval_date_ql = ql.Date(eval_date.day, eval_date.month, eval_date.year)
 
         ql.Settings.instance().evaluationDate = eval_date_ql
 
-        helpers = []
-        for _, (price, coupon, maturity, start) in bonds.iterrows():
-            start = ql.Date(start.day, start.month, start.year)
-            maturity = ql.Date(maturity.day, maturity.month, maturity.year)
-
-            schedule = ql.MakeSchedule(
-                start,
-                maturity,
-                ql.Period(ql.Annual),
-                calendar=self.calendar,
-                convention=ql.ModifiedFollowing,
-                terminalDateConvention=ql.ModifiedFollowing,
-                rule=ql.DateGeneration.Backward,
-                endOfMonth=False,
-            )
-
-            quote = ql.QuoteHandle(ql.SimpleQuote(price))
-            helper = ql.FixedRateBondHelper(
-                quote,
-                self.settlement_days,
-                100.0,
-                schedule,
-                [coupon],
-                self.day_counter,
-                ql.Following,
-                100.0,
-                start,
-            )
-            helpers.append(helper)
+        helpers = {}
+        for seria, (price, coupon, maturity, start) in bonds.iterrows():
+            key = (seria, start, coupon, maturity)
+            if key not in self._helpers:
+                self._helpers[key] = self._make_helper(price, coupon, maturity, start)
+            quote, helper = self._helpers[key]
+            quote.setValue(price)
+            helpers[key] = helper
 
-        curve = curve_cls(eval_date_ql, helpers, self.day_counter)
-        return ql.YieldTermStructureHandle(curve)
+        # series that left the eligible set are dropped
+        self._helpers = {key: self._helpers[key] for key in helpers}
 
-    def get_zero_rates_from_curve(
-        self,
-        curve: YieldTermStructureHandle,
-        eval_date: datetime,
-        periods=(0, 1, 2, 3, 6, 12, 24, 36, 60, 84, 120, 180),
-    ):
-        eval_date_ql = ql.Date(eval_date.day, eval_date.month, eval_date.year)
-        rates = []
-        for period in periods:
-            moved_date = eval_date_ql + ql.Period(period, ql.Months)
-            try:
-                rate = curve.zeroRate(moved_date, ql.ActualActual(ql.ActualActual.ISMA), ql.Continuous)
-            except Exception:
-                logger.debug(
-                    "failed to calculate zero-rate",
-                    extra={"eval_date": eval_date.isoformat(), "period": period},
-                )
-            else:
-                rates.append((rate.rate(), eval_date, moved_date.to_date(), period))
+        curve_key = (curve_cls, tuple(helpers))
+        if curve_key != self._curve_key:
+            # reference date of the curve moves with the evaluation date
+            self._curve = curve_cls(0, ql.NullCalendar(), list(helpers.values()), self.day_counter)
+            self._curve_key = curve_key
 
-        return rates
+        return ql.YieldTermStructureHandle(self._curve)
 
     @staticmethod
-    def nss(params, periods):
-        beta0, beta1, beta2, beta3, tau1, tau2 = params
-
-        return (
-            (beta0)
-            + (beta1 * (-np.expm1(-periods / tau1) / (periods / tau1)))
-            + (beta2 * (-(np.expm1(-periods / tau1) / (periods / tau1)) - (np.exp(-periods / tau1))))
-            + (beta3 * (-(np.expm1(-periods / tau2) / (periods / tau2)) - (np.exp(-periods / tau2))))
-        )
+    def curve_times(dates: pd.DatetimeIndex, periods: Sequence[int]) -> np.ndarray:
+        """Calculate ActualActual ISDA times of curves from dates to maturities, for all dates at once.
 
-    @staticmethod
-    def objective_function(initial_guess, df):
-        nss_ = NSShelper.nss(initial_guess, df.period)
-        return ((df.rate - nss_) ** 2).sum()
+        ISDA time between two dates is the difference of their decimal years,
+        in which the day of year is divided by the length of that year.
 
-    def calculate_zero_rates(self, data, dates):
-        rates = []
+        Args:
+            dates (pd.DatetimeIndex): dates of curves
+            periods (Sequence[int]): maturities in months
 
-        for eval_date in dates:
-            bonds = data.loc[eval_date, ["fix_price", "Kupon", "Data wykupu", "Początek okresu"]]
-            curve = self.build_zero_curve_from_bonds(bonds, eval_date)
+        Returns:
+            np.ndarray: dates x periods times, as used by curves built with ISDA day counter
 
-            rate = self.get_zero_rates_from_curve(curve, eval_date)
-            rates.extend(rate)
+        """
 
-        zero_rates = (
-            pd.DataFrame(rates, columns=["rate", "eval_date", "future_date", "period"])
-            .drop_duplicates()
-            .astype({"future_date": "datetime64[ns]"})
-            .set_index(["eval_date", "future_date"])
-            .sort_index()
+        def decimal_year(days: pd.DatetimeIndex) -> np.ndarray:
+            return (days.year + (days.dayofyear - 1) / (365 + days.is_leap_year)).to_numpy()
+
+        start = decimal_year(dates)
+        # adding months clamps the day to the end of month, as QuantLib does
+        return np.column_stack([decimal_year(dates + pd.DateOffset(months=int(period))) - start for period in periods])
+
+    def get_zero_rates_from_curve(
+        self,
+        curve: YieldTermStructureHandle,
+        eval_date: datetime,
+        curve_times: np.ndarray,
+        times: np.ndarray,
+        out: np.ndarray,
+    ) -> None:
+        """Fill zero rates of a curve, leaving NaN where they cannot be calculated.
+
+        Rates are continuously compounded, calculated from discount factors
+        at float times, so no QuantLib dates or rate objects are created.
+
+        Args:
+            curve (YieldTermStructureHandle): zero curve
+            eval_date (datetime): date of the curve
+            curve_times (np.ndarray): times of maturities on the time axis of the curve
+            times (np.ndarray): times of maturities the rates are quoted for, longer than 0
+            out (np.ndarray): row of rates to fill
+
+        """
+        try:
+            # bootstraps the curve, which fails for all maturities at once
+            max_time = curve.maxTime()
+        except RuntimeError:
+            logger.debug("failed to bootstrap zero curve", extra={"eval_date": eval_date.isoformat()})
+            return
+
+        # times of the last date of the curve may differ from max_time by rounding, far less than a day
+        tolerance = 1e-9
+        discounts = np.array(
+            [curve.discount(min(time, max_time)) if time <= max_time + tolerance else np.nan for time in curve_times],
         )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[:] = -np.log(discounts) / times
 
-        return zero_rates
+    def calculate_zero_rates(self, data, dates, periods: Sequence[int] = ZERO_RATE_PERIODS) -> ZeroRateGrid:
+        """Calculate zero rates of dates on a grid of maturities.
 
-    def calculate_params(self, zero_rates, dates):
-        vals = []
+        Rates are quoted ActualActual ISMA, which for whole months is months / 12,
+        so their times are the same for all dates.
 
-        for idx in dates:
-            df = zero_rates.loc[idx]
-            c = minimize(
-                fun=self.objective_function,
-                x0=[0.01, 0.01, 0.01, 0.01, 1.00, 1.00],
-                args=(df,),
-            )
-            vals.append(c)
+        Args:
+            data (pd.DataFrame): bond prices indexed by (Date, Seria)
+            dates (pd.DatetimeIndex): dates to calculate
+            periods (Sequence[int], optional): maturities in months. Defaults to ZERO_RATE_PERIODS.
+
+        Returns:
+            ZeroRateGrid: dates x maturities rates, NaN where a curve could not be calculated
 
-        params = pd.DataFrame(
-            [val.x for val in vals],
-            columns=["beta0", "beta1", "beta2", "beta3", "tau1", "tau2"],
-            index=dates,
+        """
+        grid = ZeroRateGrid(dates, np.asarray(periods, dtype=float), np.full((len(dates), len(periods)), np.nan))
+        times = grid.periods / 12
+        curve_times = self.curve_times(dates, periods)
+
+        for row, eval_date in enumerate(dates):
+            bonds = data.loc[eval_date, ["fix_price", "Kupon", "Data wykupu", "Początek okresu"]]
+            curve = self.build_zero_curve_from_bonds(bonds, eval_date)
+            self.get_zero_rates_from_curve(curve, eval_date, curve_times[row], times, grid.rates[row])
+
+        if grid.failed.any():
+            logger.debug("some zero rates failed", extra={"failed": int(grid.failed.sum())})
+
+        return grid
+
+    def calculate_params(self, zero_rates: ZeroRateGrid, x0=None):
+        """Fit nss params of dates, each date starting from params of the previous one.
+
+        Args:
+            zero_rates (ZeroRateGrid): zero rates of dates
+            x0 (Sequence[float] | None, optional): params of the date before the first one.
+                Defaults to None (guessed from rates).
+
+        Returns:
+            pd.DataFrame: params with number of iterations 'nit' and rmse 'residual' of fits, indexed by dates
+
+        """
+        dates = zero_rates.dates
+        fits = fit_many([zero_rates.periods] * len(dates), list(zero_rates.rates), x0=x0)
+
+        params = pd.DataFrame([fit.params for fit in fits], columns=list(PARAMS), index=dates)
+        params["nit"] = np.array([fit.nit for fit in fits], dtype="int32")
+        params["residual"] = [fit.residual for fit in fits]
+        logger.info(
+            "fitted nss params",
+            extra={
+                "dates": len(dates),
+                "mean_nit": params.nit.mean(),
+                "max_residual": params.residual.max(),
+                "not_converged": sum(not fit.success for fit in fits),
+            },
         )
         return params
 
-    def calculate_all(self, data, dates):
-        zero_rates = self.calculate_zero_rates(data, dates)
-        params = self.calculate_params(zero_rates, dates)
+    def calculate_all(self, data, dates, workers: int = 1, x0=None):
+        """Calculate zero rates and nss params of dates.
+
+        With more than one worker, zero curves are bootstrapped in contiguous
+        shards of dates in separate processes, each with its own QuantLib
+        evaluation date. Fitting is cheap, so all dates are fitted in this
+        process in order, every one warm started from the previous date and
+        the first one from x0, and results do not depend on workers.
+
+        Args:
+            data (pd.DataFrame): bond prices indexed by (Date, Seria)
+            dates (pd.DatetimeIndex): sorted dates to calculate
+            workers (int, optional): number of processes. Defaults to 1 (calculate in this process).
+            x0 (Sequence[float] | None, optional): nss params of the date before the first one.
+                Defaults to None (guessed from rates).
+
+        Returns:
+            pd.DataFrame: params indexed by dates
+
+        """
+        if workers <= 1 or len(dates) <= 1:
+            zero_rates = self.calculate_zero_rates(data, dates)
+        else:
+            zero_rates = self.calculate_zero_rates_in_pool(data, dates, workers)
+        return self.calculate_params(zero_rates, x0)
+
+    def calculate_zero_rates_in_pool(self, data, dates, workers: int) -> ZeroRateGrid:
+        bounds = np.array_split(np.arange(len(dates)), min(len(dates), workers * self.SHARDS_PER_WORKER))
+        shards = [dates[rows[0] : rows[-1] + 1] for rows in bounds]
+        logger.info(
+            "calculating zero rates in shards",
+            extra={"dates": len(dates), "shards": len(shards), "workers": workers},
+        )
 
-        months = np.arange(1, 181)
+        results = {}
+        dates_done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_calculate_zero_rates_shard, data.loc[shard[0] : shard[-1]], shard): i
+                for i, shard in enumerate(shards)
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                dates_done += len(shards[i])
+                logger.info(
+                    "zero rates shard done",
+                    extra={"shards_done": len(results), "shards": len(shards), "dates_done": dates_done},
+                )
+
+        # shards are contiguous, so joining them in order keeps dates sorted
+        return ZeroRateGrid(
+            dates,
+            results[0].periods,
+            np.vstack([results[i].rates for i in range(len(shards))]),
+        )
 
-        curves = params.apply(self.nss, args=(months,), axis="columns", result_type="expand")
-        curves.columns = [str(month) for month in months]
 
-        full = params.join(curves)
-        return full
+def _calculate_zero_rates_shard(data: pd.DataFrame, dates: pd.DatetimeIndex) -> ZeroRateGrid:
+    """Calculate zero rates of a shard of dates in a worker process."""
+    return NSShelper().calculate_zero_rates(data, dates)
 
 
 class TermStructureBot(TwitterBot):
-    BONDSPOT_LINK = "https://www.bondspot.pl/fixing_obligacji"
     REQUESTS_MAX_RATE = 5
+    PARSE_WORKERS = 2
+    # history read before new nss dates, prices missing on them are filled from it
+    NSS_LOOKBACK = pd.offsets.Day(31)
     FIGSIZE = (16, 9)
     FONTNAME = "FiraCode Nerd Font"
     TITLE_FONT_SIZE = 24
     SUBTITLE_FONT_SIZE = 14
 
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(self, *args, workers: int = 1, **kwargs) -> None:
         super().__init__(*args, **kwargs)
 
+        self.workers = workers
+
         self.interest_calendar: pd.DataFrame | None = None
         self.bond_prices: pd.DataFrame | None = None
-        self.nss_curve: pd.DataFrame | None = None
+        self.nss_params: pd.DataFrame | None = None
 
         with Path("config", "request_header.json").open(encoding="utf-8") as f:
             self._request_headers = json.load(f)
 
+        self.bondspot_fetcher = BondspotFetcher(self._request_headers, max_rate=self.REQUESTS_MAX_RATE)
+        self.bond_store = BondPriceStore()
+        self.nss_store = NSSParamsStore()
+
     def update_interest_calendar(self) -> pd.DataFrame:
-        resp = httpx.get("https://www.gov.pl/web/finanse/kupony")
+        meta = load_meta()
+        current = pd.read_parquet(CALENDAR_PATH) if CALENDAR_PATH.exists() else None
+
+        resp = self.replay.call(
+            "govpl_kupony",
+            httpx.get,
+            "https://www.gov.pl/web/finanse/kupony",
+            headers=conditional_headers(meta.get("page", {})) if current is not None else {},
+        )
+        if resp.status_code == httpx.codes.NOT_MODIFIED:
+            logger.info("coupon calendar page not modified, skipping download")
+            self.interest_calendar = current
+            return current
+        resp.raise_for_status()
 
         hash_ = re.search(r'href="/attachment/([\w-]+)"', resp.text).groups()[0]
-        url = f"https://www.gov.pl/attachment/{hash_}"
-
-        bond_cal = (
-            pd.read_excel(
-                url,
-                header=[0, 1],
-                sheet_name="ObligacjeStałoprocentowe",
-            )
-            .rename(
-                columns={
-                    "Unnamed: 0_level_0": "Info",
-                    "Unnamed: 1_level_0": "Info",
-                    "Unnamed: 2_level_0": "Info",
-                    "Unnamed: 3_level_0": "Info",
-                },
-            )
-            .replace({"-": pd.NA})
-        )
+        if current is not None and hash_ == meta.get("attachment_hash"):
+            logger.info("coupon calendar attachment not changed, skipping download", extra={"hash": hash_})
+            save_meta({**meta, "page": validators_of(resp)})
+            self.interest_calendar = current
+            return current
 
-        info = bond_cal.Info  # loc[:, ["Info"]].stack(level=0, future_stack=True).reset_index(1, drop=True)
-        calendar = (
-            bond_cal.loc[:, [f"Kupon Nr {num}" for num in range(1, 32)]]
-            .stack(level=0, future_stack=True)
-            .reset_index(1)
-            .rename(columns={"level_1": "Numer okresu"})
+        url = f"https://www.gov.pl/attachment/{hash_}"
+        attachment = self.replay.call(
+            f"govpl_attachment_{hash_}",
+            httpx.get,
+            url,
+            follow_redirects=True,
+            headers=conditional_headers(meta.get("attachment", {})) if current is not None else {},
         )
-
-        df = info.join(calendar).dropna(how="any")
-        df["Numer okresu"] = df["Numer okresu"].str[9:]
-        df = df.astype({
-            "Początek okresu": "datetime64[ns]",
-            "Koniec okresu": "datetime64[ns]",
-            "Dzień ustalenia praw": "datetime64[ns]",
-            "Data wymagalności": "datetime64[ns]",
-            "Odsetki (PLN)": "float64",
-            "Numer okresu": "int16",
-            "Kod ISIN": "string",
-            "Seria": "string",
+        if attachment.status_code == httpx.codes.NOT_MODIFIED:
+            logger.info("coupon calendar attachment not modified, skipping parsing", extra={"hash": hash_})
+            save_meta({**meta, "attachment_hash": hash_, "page": validators_of(resp)})
+            self.interest_calendar = current
+            return current
+        attachment.raise_for_status()
+
+        df = parse_interest_calendar(attachment.content)
+        if current is not None:
+            df, changed = merge_series(current, df)
+            logger.info("merged coupon calendar", extra={"changed_series": changed})
+
+        df.to_parquet(CALENDAR_PATH, index=False)
+        # meta is saved after the calendar, a crash in between only repeats the download
+        save_meta({
+            "attachment_hash": hash_,
+            "page": validators_of(resp),
+            "attachment": validators_of(attachment),
         })
 
-        path = Path("data", "interest_calendar.parquet")
-        df.to_parquet(path, index=False)
-
         self.interest_calendar = df
 
         return df
 
-    async def _make_request_to_bondspot(
-        self,
-        client: httpx.AsyncClient,
-        date: str,
-        fixing: int,
-        limiter: AsyncLimiter,
-    ) -> httpx.Response:
-        async with limiter:
-            params = {"date": date, "type": fixing}
-            logger.info("making request to bondspot", extra=params)
-            return await client.get(
-                self.BONDSPOT_LINK,
-                params=params,
-                headers=self._request_headers,
-            )
-
     async def get_bond_prices_data(
         self,
         start_date: str | datetime = "2000-01-01",
         end_date: str | datetime | None = None,
-    ) -> list[httpx.Response]:
+        fixings: Iterable[int] | None = None,
+    ) -> list[pd.DataFrame]:
         if end_date is None:
             end_date = datetime.today()
 
-        dates = [date.strftime("%Y%m%d") for date in pd.date_range(start_date, end_date, freq="B")]
+        # holidays and weekends never have fixings
+        dates = session_dates(start_date, end_date)
 
         if not dates:
             return []
 
-        limiter = AsyncLimiter(max_rate=self.REQUESTS_MAX_RATE, time_period=1)
-        async with (
-            httpx.AsyncClient(timeout=60.0) as client,
-            asyncio.TaskGroup() as tg,
-        ):
-            tasks = [
-                tg.create_task(
-                    self._make_request_to_bondspot(
-                        client=client,
-                        date=date,
-                        fixing=fixing,
-                        limiter=limiter,
-                    ),
-                )
-                for date, fixing in product(dates, (1, 2))
+        # pages are parsed in worker processes while the rest is still downloading
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.PARSE_WORKERS) as pool:
+            parsed = [
+                (key, html, loop.run_in_executor(pool, parse_fixing_page, html, *key))
+                async for key, html in self.bondspot_fetcher.stream(dates, fixings)
             ]
-
-        return [task.result() for task in tasks]
-
-    def _filter_dfs(self, results: list[httpx.Response]) -> list[pd.DataFrame]:
-        dfs = []
-        for result in results:
-            html = result.text
-            params = result.url.params
-            date = params["date"]
-            fixing = params["type"]
-            try:
-                df = pd.read_html(StringIO(html))[2]
-            except Exception:
-                logger.exception("bad response", extra={"date": date, "fixing": fixing})
-            else:
-                df["date"] = date
-                df["fixing"] = fixing
-                dfs.append(df)
-        return dfs
+            dfs = {}
+            for key, html, result in parsed:
+                df, error = await result
+                if error is None:
+                    # only pages with fixings are worth resuming from
+                    self.bondspot_fetcher.keep(*key, html)
+                else:
+                    # logged here, records from worker processes never reach the log files
+                    date, fixing = key
+                    logger.error("bad response", extra={"date": date, "fixing": fixing, "traceback": error})
+                    self.bondspot_fetcher.cache.discard(*key)
+                dfs[key] = df
+
+        return [dfs[key] for key in sorted(dfs) if dfs[key] is not None]
 
     def update_bond_prices(self) -> None:
-        current_data = pd.read_parquet(Path("data", "bond_prices.parquet"))
-        last_request_date = current_data.Date.max().date() + pd.offsets.BDay(1)
-
-        coroutine = self.get_bond_prices_data(start_date=last_request_date)
-        results = asyncio.run(coroutine)
-        new_data = self._filter_dfs(results)
+        self.bond_store.migrate()
+        last_date = self.bond_store.last_date()
+        last_request_date = last_date.date() + pd.offsets.BDay(1)
+        # pages of stored prices are never requested again
+        self.bondspot_fetcher.cache.prune(last_date.strftime("%Y%m%d"))
+
+        # last sessions looked at for published fixings are in this or the previous month
+        current_data = self.bond_store.read(start=last_date - pd.offsets.MonthBegin(2), columns=["Date", "Fixing"])
+        coroutine = self.get_bond_prices_data(
+            start_date=last_request_date,
+            fixings=available_fixings(current_data),
+        )
+        new_data = asyncio.run(coroutine)
 
         if not new_data:
             logger.warning("no new bond prices data was downloaded")
-            self.bond_prices = current_data
+            self.bond_prices = pd.DataFrame()
             return
 
         new_data = pd.concat(new_data)
@@ -331,18 +490,37 @@ class TermStructureBot(TwitterBot):
         )
         new_data = new_data.drop(columns=new_data.columns.difference(column_types.keys()))
 
-        data = pd.concat([current_data, new_data])
-        data.to_parquet(Path("data", "bond_prices.parquet"), index=False)
-        self.bond_prices = data
+        # only new prices are written, history stays untouched
+        self.bond_store.append(new_data)
+        self.bond_prices = new_data
+        self.bondspot_fetcher.cache.prune(new_data.Date.max().strftime("%Y%m%d"))
+
+    def update_nss_curve(self, refit: bool = False) -> pd.DataFrame:
+        """Fit nss params of dates without them and save them.
+
+        Args:
+            refit (bool, optional): fit all dates again and replace stored params,
+                needed after a change of the fit, so old and new dates are fitted alike. Defaults to False.
 
-    def update_nss_curve(self) -> pd.DataFrame:
+        Returns:
+            pd.DataFrame: params of all dates
+
+        """
         logger.info("preparing bond prices data for nss")
         interest_calendar = pd.read_parquet(
-            Path("data", "interest_calendar.parquet"),
+            CALENDAR_PATH,
             columns=["Seria", "Kod ISIN", "Koniec okresu", "Początek okresu", "Kupon", "Data wykupu"],
         )
-        ceny_rentownosci = pd.read_parquet(
-            Path("data", "bond_prices.parquet"),
+        self.nss_store.migrate()
+        nss_data = self.nss_store.read()
+        last_nss_date = nss_data.index.max()
+        if refit:
+            logger.info("refitting nss params of all dates", extra={"stored_dates": len(nss_data)})
+            nss_data = nss_data.iloc[:0]
+
+        # only partitions of dates without nss and a short history before them are read
+        ceny_rentownosci = self.bond_store.read(
+            start=None if refit else last_nss_date - self.NSS_LOOKBACK,
             columns=["Seria", "Kod ISIN", "Fixing", "fix_price", "Date"],
         )
 
@@ -360,26 +538,32 @@ class TermStructureBot(TwitterBot):
             .sort_index()
         )
 
-        nss_data = pd.read_parquet(Path("data", "nss_curve.parquet"))
-        last_nss_date = nss_data.index.max()
-
         logger.info("cheking for new data for nss")
-        data_to_do_nss = data.loc[last_nss_date + pd.offsets.Day(1) :]
+        data_to_do_nss = data if refit else data.loc[last_nss_date + pd.offsets.Day(1) :]
         dates_to_do_nss = data_to_do_nss.index.get_level_values("Date").unique()
         if dates_to_do_nss.empty:
             logger.warning("no new data for nss")
-            self.nss_curve = nss_data
+            self.nss_params = nss_data
             return nss_data
 
         logger.info("calculating rates and params for nss")
         nss_helper = NSShelper()
-        new_nss_data = nss_helper.calculate_all(data_to_do_nss, dates_to_do_nss)
+        # fits start from the last stored params, unless they were never stored or are refitted
+        last_params = None
+        if not refit:
+            last_params = nss_data.loc[last_nss_date, list(PARAMS)].to_numpy(dtype=float)
+        new_nss_data = nss_helper.calculate_all(
+            data_to_do_nss,
+            dates_to_do_nss,
+            workers=self.workers,
+            x0=last_params if last_params is not None and np.isfinite(last_params).all() else None,
+        )
 
         updated_nss_data = pd.concat([nss_data, new_nss_data])
 
-        logger.info("saving updated nss curve")
-        updated_nss_data.to_parquet(Path("data", "nss_curve.parquet"))
-        self.nss_curve = updated_nss_data
+        logger.info("saving updated nss params")
+        self.nss_store.write(updated_nss_data)
+        self.nss_params = updated_nss_data
 
         return updated_nss_data
 
@@ -388,14 +572,12 @@ class TermStructureBot(TwitterBot):
         self.update_bond_prices()
         self.update_nss_curve()
 
-    def calculate_term_structure(self, *, update_data: bool = False) -> NominalACM:
+    def calculate_term_structure(self, *, update_data: bool = False, maturities=MATURITIES) -> NominalACM:
         if update_data:
             self.update_data()
 
-        data = pd.read_parquet(Path("data", "nss_curve.parquet"))
-        data = data.drop(columns=["beta0", "beta1", "beta2", "beta3", "tau1", "tau2"])
-        data = data.resample("ME").last()
-        data.columns = [int(col) for col in data.columns]
+        self.nss_store.migrate()
+        data = self.nss_store.curves(maturities).resample("ME").last()
 
         acm = NominalACM(
             curve=data,
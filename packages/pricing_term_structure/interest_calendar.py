@@ -0,0 +1,153 @@
+"""Coupon calendar of fixed rate bonds from gov.pl.
+
+The calendar is an Excel attachment, which changes rarely. Its hash and the
+HTTP validators of the last download are kept next to the parquet file, so
+an unchanged attachment is neither downloaded nor parsed again, and only
+series that are new or changed are merged into the stored calendar.
+"""
+
+import json
+import os
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+import pandas as pd
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+CALENDAR_PATH = Path("data", "interest_calendar.parquet")
+META_PATH = Path("data", "interest_calendar.meta.json")
+
+
+def load_meta(path: Path = META_PATH) -> dict:
+    """Load hash and validators of the last downloaded attachment.
+
+    Args:
+        path (Path, optional): meta file. Defaults to META_PATH.
+
+    Returns:
+        dict: meta, empty if nothing was downloaded yet
+
+    """
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_meta(meta: dict, path: Path = META_PATH) -> None:
+    """Save meta, replacing it atomically.
+
+    Args:
+        meta (dict): hash and validators
+        path (Path, optional): meta file. Defaults to META_PATH.
+
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def validators_of(response: httpx.Response) -> dict:
+    """Get validators of a response.
+
+    Args:
+        response (httpx.Response): response
+
+    Returns:
+        dict: 'etag' and 'last_modified' the server sent
+
+    """
+    validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return {name: value for name, value in validators.items() if value is not None}
+
+
+def conditional_headers(validators: dict) -> dict:
+    """Make headers of a request answered with 304 if nothing changed.
+
+    Args:
+        validators (dict): validators of the previous response
+
+    Returns:
+        dict: If-None-Match and If-Modified-Since headers
+
+    """
+    headers = {}
+    if "etag" in validators:
+        headers["If-None-Match"] = validators["etag"]
+    if "last_modified" in validators:
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def parse_interest_calendar(content: bytes) -> pd.DataFrame:
+    """Parse coupon periods of fixed rate bonds from the attachment.
+
+    Args:
+        content (bytes): Excel attachment
+
+    Returns:
+        pd.DataFrame: one row per coupon period of a series
+
+    """
+    bond_cal = (
+        pd.read_excel(
+            BytesIO(content),
+            header=[0, 1],
+            sheet_name="ObligacjeStałoprocentowe",
+        )
+        .rename(
+            columns={
+                "Unnamed: 0_level_0": "Info",
+                "Unnamed: 1_level_0": "Info",
+                "Unnamed: 2_level_0": "Info",
+                "Unnamed: 3_level_0": "Info",
+            },
+        )
+        .replace({"-": pd.NA})
+    )
+
+    info = bond_cal.Info  # loc[:, ["Info"]].stack(level=0, future_stack=True).reset_index(1, drop=True)
+    calendar = (
+        bond_cal.loc[:, [f"Kupon Nr {num}" for num in range(1, 32)]]
+        .stack(level=0, future_stack=True)
+        .reset_index(1)
+        .rename(columns={"level_1": "Numer okresu"})
+    )
+
+    df = info.join(calendar).dropna(how="any")
+    df["Numer okresu"] = df["Numer okresu"].str[9:]
+    return df.astype({
+        "Początek okresu": "datetime64[ns]",
+        "Koniec okresu": "datetime64[ns]",
+        "Dzień ustalenia praw": "datetime64[ns]",
+        "Data wymagalności": "datetime64[ns]",
+        "Odsetki (PLN)": "float64",
+        "Numer okresu": "int16",
+        "Kod ISIN": "string",
+        "Seria": "string",
+    })
+
+
+def merge_series(current: pd.DataFrame, new: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    """Replace series that are new or changed, keep the others as they are.
+
+    Series missing from the new calendar stay in the stored one.
+
+    Args:
+        current (pd.DataFrame): stored calendar
+        new (pd.DataFrame): downloaded calendar
+
+    Returns:
+        tuple[pd.DataFrame, list[str]]: merged calendar and changed series
+
+    """
+    diff = current.merge(new, how="outer", indicator=True)
+    changed = diff.loc[(diff["_merge"] != "both") & diff.Seria.isin(new.Seria), "Seria"].unique().tolist()
+
+    merged = pd.concat([current.loc[~current.Seria.isin(changed)], new.loc[new.Seria.isin(changed)]])
+    return merged.reset_index(drop=True), sorted(changed)
@@ -0,0 +1,224 @@
+"""Fitting Nelson-Siegel-Svensson curves to zero rates.
+
+Curves are fitted with bounded least squares using the analytic Jacobian of
+the model. Only the decays are bounded: tau1 to a few years and tau2 to
+later than tau1, so the two humps of the curve cannot swap places between
+dates. Fits of consecutive dates start from the parameters of the previous
+date, which are usually close to the solution, so a fit takes a few
+iterations and stays in the same basin for the decay parameters.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.optimize import least_squares
+
+PARAMS = ("beta0", "beta1", "beta2", "beta3", "tau1", "tau2")
+
+# decays in months: tau1 up to 2 years, tau2 later than tau1 by 6 months to 5 years
+TAU1_BOUNDS = (2.0, 24.0)
+TAU_GAP_BOUNDS = (6.0, 60.0)
+
+# bounds of fitted variables: beta0, beta1, beta2, beta3, tau1, tau2 - tau1
+LOWER_BOUNDS = np.array([-np.inf, -np.inf, -np.inf, -np.inf, TAU1_BOUNDS[0], TAU_GAP_BOUNDS[0]])
+UPPER_BOUNDS = np.array([np.inf, np.inf, np.inf, np.inf, TAU1_BOUNDS[1], TAU_GAP_BOUNDS[1]])
+
+
+@dataclass(frozen=True)
+class NSSFit:
+    """Result of fitting a curve.
+
+    Attributes:
+        params (np.ndarray): beta0, beta1, beta2, beta3, tau1, tau2
+        nit (int): number of iterations
+        residual (float): root mean square error of fitted rates
+        success (bool): whether the fit converged
+
+    """
+
+    params: np.ndarray
+    nit: int
+    residual: float
+    success: bool
+
+
+def _loadings(periods: np.ndarray, tau: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    x = periods / tau
+    decay = np.exp(-x)
+    slope = -np.expm1(-x) / x
+    return x, decay, slope
+
+
+def nss(params: Sequence[float], periods: np.ndarray) -> np.ndarray:
+    """Calculate rates of the curve.
+
+    Args:
+        params (Sequence[float]): beta0, beta1, beta2, beta3, tau1, tau2
+        periods (np.ndarray): periods in months, NaN is returned for 0
+
+    Returns:
+        np.ndarray: rates of periods
+
+    """
+    beta0, beta1, beta2, beta3, tau1, tau2 = params
+    periods = np.asarray(periods, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        _, decay1, slope1 = _loadings(periods, tau1)
+        _, decay2, slope2 = _loadings(periods, tau2)
+    return beta0 + beta1 * slope1 + beta2 * (slope1 - decay1) + beta3 * (slope2 - decay2)
+
+
+def nss_grid(params: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """Calculate rates of many curves at once.
+
+    Args:
+        params (np.ndarray): dates x (beta0, beta1, beta2, beta3, tau1, tau2)
+        periods (np.ndarray): periods in months
+
+    Returns:
+        np.ndarray: dates x periods rates
+
+    """
+    params = np.asarray(params, dtype=float)
+    return nss(params.T[:, :, None], np.asarray(periods, dtype=float)[None, :])
+
+
+def nss_jacobian(params: Sequence[float], periods: np.ndarray) -> np.ndarray:
+    """Calculate derivatives of rates of the curve with respect to its parameters.
+
+    Args:
+        params (Sequence[float]): beta0, beta1, beta2, beta3, tau1, tau2
+        periods (np.ndarray): periods in months, greater than 0
+
+    Returns:
+        np.ndarray: periods x parameters derivatives
+
+    """
+    _, beta1, beta2, beta3, tau1, tau2 = params
+    periods = np.asarray(periods, dtype=float)
+    x1, decay1, slope1 = _loadings(periods, tau1)
+    x2, decay2, slope2 = _loadings(periods, tau2)
+
+    # d slope / dx = (decay - slope) / x, d curvature / dx = d slope / dx + decay
+    dslope1 = (decay1 - slope1) / x1
+    dslope2 = (decay2 - slope2) / x2
+    # dx / dtau = -x / tau
+    dtau1 = (beta1 * dslope1 + beta2 * (dslope1 + decay1)) * -x1 / tau1
+    dtau2 = beta3 * (dslope2 + decay2) * -x2 / tau2
+
+    return np.column_stack([np.ones_like(periods), slope1, slope1 - decay1, slope2 - decay2, dtau1, dtau2])
+
+
+def _to_variables(params: np.ndarray) -> np.ndarray:
+    variables = np.array(params, dtype=float)
+    variables[5] -= variables[4]
+    return variables
+
+
+def _to_params(variables: np.ndarray) -> np.ndarray:
+    params = np.array(variables, dtype=float)
+    params[5] += params[4]
+    return params
+
+
+def _variables_jacobian(variables: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    jacobian = nss_jacobian(_to_params(variables), periods)
+    # chain rule of tau2 = tau1 + gap
+    jacobian[:, 4] += jacobian[:, 5]
+    return jacobian
+
+
+def cold_start(periods: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """Guess parameters from the shape of rates.
+
+    Args:
+        periods (np.ndarray): periods in months
+        rates (np.ndarray): zero rates
+
+    Returns:
+        np.ndarray: level at the longest period, slope to the shortest one, no curvature
+            and decays of one and five years
+
+    """
+    order = np.argsort(periods)
+    long_rate, short_rate = rates[order[-1]], rates[order[0]]
+    return np.array([long_rate, short_rate - long_rate, 0.0, 0.0, 12.0, 60.0])
+
+
+def fit(periods: np.ndarray, rates: np.ndarray, x0: Sequence[float] | None = None) -> NSSFit:
+    """Fit a curve to zero rates.
+
+    Periods of 0 months and missing rates are left out. Starting decays
+    outside of bounds are moved to the nearest allowed ones.
+
+    Args:
+        periods (np.ndarray): periods in months
+        rates (np.ndarray): zero rates
+        x0 (Sequence[float] | None, optional): starting parameters, e.g. of the previous date.
+            Defaults to None (guessed from rates).
+
+    Returns:
+        NSSFit: fitted parameters with iterations and residual
+
+    """
+    periods = np.asarray(periods, dtype=float)
+    rates = np.asarray(rates, dtype=float)
+    valid = (periods > 0) & np.isfinite(rates)
+    periods, rates = periods[valid], rates[valid]
+
+    if len(periods) < len(PARAMS):
+        return NSSFit(np.full(len(PARAMS), np.nan), nit=0, residual=np.nan, success=False)
+
+    start = cold_start(periods, rates) if x0 is None else np.asarray(x0, dtype=float)
+    if not np.isfinite(start).all():
+        start = cold_start(periods, rates)
+    start = np.clip(_to_variables(start), LOWER_BOUNDS, UPPER_BOUNDS)
+
+    result = least_squares(
+        lambda variables: nss(_to_params(variables), periods) - rates,
+        start,
+        jac=lambda variables: _variables_jacobian(variables, periods),
+        bounds=(LOWER_BOUNDS, UPPER_BOUNDS),
+        method="trf",
+    )
+    return NSSFit(
+        params=_to_params(result.x),
+        nit=int(result.njev),
+        residual=float(np.sqrt(np.mean(result.fun**2))),
+        success=bool(result.success),
+    )
+
+
+def fit_many(
+    periods: Sequence[np.ndarray],
+    rates: Sequence[np.ndarray],
+    x0: Sequence[float] | None = None,
+) -> list[NSSFit]:
+    """Fit curves of consecutive dates, each starting from the previous fit.
+
+    A fit that did not converge from the previous parameters is repeated
+    from a guess and the better one is kept.
+
+    Args:
+        periods (Sequence[np.ndarray]): periods in months of every date
+        rates (Sequence[np.ndarray]): zero rates of every date
+        x0 (Sequence[float] | None, optional): starting parameters of the first date.
+            Defaults to None (guessed from rates).
+
+    Returns:
+        list[NSSFit]: fits in order of dates
+
+    """
+    fits = []
+    previous = x0
+    for date_periods, date_rates in zip(periods, rates, strict=True):
+        result = fit(date_periods, date_rates, previous)
+        if previous is not None and not result.success:
+            cold = fit(date_periods, date_rates)
+            if cold.residual < result.residual:
+                result = NSSFit(cold.params, result.nit + cold.nit, cold.residual, cold.success)
+        fits.append(result)
+        if np.isfinite(result.params).all():
+            previous = result.params
+    return fits
@@ -0,0 +1,94 @@
+"""Stored parameters of fitted Nelson-Siegel-Svensson curves.
+
+Only the six parameters of every date are stored. Curves are evaluated from
+them on demand for any grid of maturities, and repeated grids are served
+from a cache until the stored parameters change.
+"""
+
+import os
+from collections.abc import Sequence
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from mylogging import setup
+from nss_fit import PARAMS, nss_grid
+
+logger = setup(__name__, __file__)
+
+# maturities of curves in months
+MATURITIES = tuple(range(1, 181))
+
+
+@lru_cache(maxsize=16)
+def _materialize(path: Path, mtime_ns: int, maturities: tuple[int, ...]) -> pd.DataFrame:
+    # mtime_ns is a part of the key only, so a rewritten file is read again
+    params = pd.read_parquet(path, columns=list(PARAMS))
+    return pd.DataFrame(nss_grid(params.to_numpy(), np.array(maturities)), index=params.index, columns=list(maturities))
+
+
+class NSSParamsStore:
+    """Parquet file of nss params by date.
+
+    Attributes:
+        path (Path): file with params, fit iterations 'nit' and rmse 'residual'
+        legacy_path (Path): file with params and curves migrated on first use
+
+    """
+
+    def __init__(
+        self,
+        path: Path = Path("data", "nss_params.parquet"),
+        legacy_path: Path = Path("data", "nss_curve.parquet"),
+    ) -> None:
+        self.path = path
+        self.legacy_path = legacy_path
+
+    def migrate(self) -> None:
+        """Keep only params of the legacy file with curves, if params are not stored yet.
+
+        The legacy file is left in place.
+        """
+        if self.path.exists() or not self.legacy_path.exists():
+            return
+
+        legacy_columns = pd.read_parquet(self.legacy_path).columns
+        columns = [column for column in (*PARAMS, "nit", "residual") if column in legacy_columns]
+        self.write(pd.read_parquet(self.legacy_path, columns=columns))
+        logger.info("migrated nss params", extra={"path": str(self.path)})
+
+    def read(self) -> pd.DataFrame:
+        """Read params.
+
+        Returns:
+            pd.DataFrame: params by date
+
+        """
+        return pd.read_parquet(self.path)
+
+    def write(self, params: pd.DataFrame) -> None:
+        """Save params, replacing the file atomically.
+
+        Args:
+            params (pd.DataFrame): params by date
+
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".parquet.tmp")
+        params.to_parquet(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def curves(self, maturities: Sequence[int] = MATURITIES) -> pd.DataFrame:
+        """Evaluate curves of all dates on a grid of maturities.
+
+        The result is cached, do not modify it in place.
+
+        Args:
+            maturities (Sequence[int], optional): maturities in months. Defaults to MATURITIES.
+
+        Returns:
+            pd.DataFrame: dates x maturities rates
+
+        """
+        return _materialize(self.path, self.path.stat().st_mtime_ns, tuple(int(maturity) for maturity in maturities))
@@ -1,3 +1,4 @@
 from .bot import TwitterBot
+from .replay import Replay, get_replay
 
-__all__ = ["TwitterBot"]
+__all__ = ["Replay", "TwitterBot", "get_replay"]
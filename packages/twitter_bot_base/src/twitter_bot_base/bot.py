@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 from abc import ABC, abstractmethod
 from pathlib import Path
 
@@ -7,6 +8,8 @@ from dotenv import load_dotenv
 from mylogging import setup
 from tweepy import API, Client, OAuth1UserHandler
 
+from .replay import get_replay
+
 load_dotenv()
 
 logger = setup(__name__, __file__)
@@ -21,8 +24,11 @@ class TwitterBot(ABC):
         self.client: Client | None = None
         self.api: API | None = None
         self.is_authenticated: bool = False
+        self.replay = get_replay()
 
-        if auto_auth:
+        if self.replay.is_replaying:
+            logger.info("replaying, skipping auth")
+        elif auto_auth:
             self.auth()
             logger.info("auth complete")
         else:
@@ -59,17 +65,30 @@ class TwitterBot(ABC):
 
         return client, api
 
-    def make_tweet(self, text: str, pictures: list[str]) -> None:
+    def make_tweet(self, text: str, pictures: list[str], *, delete_pictures: bool = True) -> None:
         """Make a tweet.
 
         Args:
             text (str): text to put in the tweet
             pictures (list[str]): list of paths to pictures to tweet
+            delete_pictures (bool, optional): delete pictures after posting. Defaults to True.
 
         Raises:
             ValueError: If the client or api is None after attempting authentication.
 
         """
+        if self.replay.mode != "off":
+            self.replay.record_payload(
+                "tweet",
+                {"text": text, "pictures": [Path(picture).name for picture in pictures]},
+            )
+
+        if self.replay.is_replaying:
+            # stand-in for twitter, nothing is posted
+            time.sleep(self.replay.latency)
+            logger.info("replayed tweet", extra={"tweet_text": text, "number_of_pictures": len(pictures)})
+            return
+
         if not self.is_authenticated:
             self.auth()
 
@@ -92,9 +111,10 @@ class TwitterBot(ABC):
 
             client.create_tweet(text=text, media_ids=lst)
 
-            logger.info("deleting used pictures")
-            for picture in pictures:
-                Path(picture).unlink()
+            if delete_pictures:
+                logger.info("deleting used pictures")
+                for picture in pictures:
+                    Path(picture).unlink()
 
         else:
             logger.info("posting without pictures")
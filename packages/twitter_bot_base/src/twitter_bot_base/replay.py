@@ -0,0 +1,168 @@
+"""Record and replay of network calls.
+
+In "record" mode results of wrapped calls are saved to a fixture directory,
+in "replay" mode they are served back from it without touching the network,
+so bots can be timed and tested on a box without internet access.
+
+Configured with environment variables:
+    BOT_REPLAY_MODE: "off" (default), "record" or "replay"
+    BOT_FIXTURES_DIR: directory with fixtures, defaults to "fixtures"
+    BOT_REPLAY_LATENCY: seconds added to every replayed call, defaults to 0
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import re
+import time
+from collections.abc import Awaitable, Callable
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from mylogging import setup
+
+logger = setup(__name__, __file__)
+
+MODES = ("off", "record", "replay")
+
+
+class Replay:
+    """Stores results of network calls under stable keys.
+
+    Attributes:
+        mode (str): "off", "record" or "replay"
+        fixtures_dir (Path): directory with recorded results
+        latency (float): seconds added to every replayed call
+
+    """
+
+    def __init__(self, mode: str = "off", fixtures_dir: Path = Path("fixtures"), latency: float = 0.0) -> None:
+        if mode not in MODES:
+            msg = f"replay mode {mode} not available"
+            raise ValueError(msg)
+
+        self.mode = mode
+        self.fixtures_dir = fixtures_dir
+        self.latency = latency
+        self._payloads_count = 0
+
+    @classmethod
+    def from_env(cls) -> "Replay":
+        return cls(
+            mode=os.environ.get("BOT_REPLAY_MODE", "off"),
+            fixtures_dir=Path(os.environ.get("BOT_FIXTURES_DIR", "fixtures")),
+            latency=float(os.environ.get("BOT_REPLAY_LATENCY", "0")),
+        )
+
+    @property
+    def is_recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def is_replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(prefix: str, *parts: object) -> str:
+        """Build a stable key from call arguments.
+
+        Args:
+            prefix (str): readable name of the call
+            *parts (object): arguments identifying the call
+
+        Returns:
+            str: key safe to use as filename
+
+        """
+        if not parts:
+            return prefix
+        digest = hashlib.sha1(repr(parts).encode(), usedforsecurity=False).hexdigest()[:16]
+        return f"{prefix}_{digest}"
+
+    def _path(self, key: str) -> Path:
+        safe_key = re.sub(r"[^\w.-]", "_", key)
+        return self.fixtures_dir / f"{safe_key}.pkl"
+
+    def _save(self, key: str, result: object) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as f:
+            pickle.dump(result, f)
+        logger.debug("recorded call", extra={"key": key})
+
+    def _load(self, key: str) -> Any:
+        path = self._path(key)
+        if not path.exists():
+            msg = f"no recorded result for {key = } in {self.fixtures_dir}"
+            raise FileNotFoundError(msg)
+        with path.open("rb") as f:
+            return pickle.load(f)
+
+    def call(self, key: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call fn, record its result or serve recorded one.
+
+        Args:
+            key (str): stable identifier of the call
+            fn (Callable[..., Any]): function making the network call
+            *args (Any): passed to fn
+            **kwargs (Any): passed to fn
+
+        Returns:
+            Any: result of fn
+
+        """
+        if self.is_replaying:
+            time.sleep(self.latency)
+            return self._load(key)
+
+        result = fn(*args, **kwargs)
+        if self.is_recording:
+            self._save(key, result)
+        return result
+
+    async def acall(self, key: str, fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        """Async version of call.
+
+        Returns:
+            Any: result of awaited fn
+
+        """
+        if self.is_replaying:
+            await asyncio.sleep(self.latency)
+            return self._load(key)
+
+        result = await fn(*args, **kwargs)
+        if self.is_recording:
+            self._save(key, result)
+        return result
+
+    def record_payload(self, name: str, payload: dict) -> None:
+        """Save payload sent to an external service.
+
+        Args:
+            name (str): what the payload is
+            payload (dict): json serializable payload
+
+        """
+        path = self.fixtures_dir / "payloads" / f"{self._payloads_count:03d}_{name}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=4, ensure_ascii=False)
+        self._payloads_count += 1
+
+
+@cache
+def get_replay() -> Replay:
+    """Get process wide replay configured from environment.
+
+    Returns:
+        Replay: shared instance
+
+    """
+    replay = Replay.from_env()
+    if replay.mode != "off":
+        logger.info("replay enabled", extra={"mode": replay.mode, "fixtures_dir": str(replay.fixtures_dir)})
+    return replay